@@ -0,0 +1,88 @@
+"""Пропускная способность чтения сжатых файлов против распакованных.
+
+Синтетический набор (generate_data.py) сжимается каждым доступным
+форматом, после чего замеряется чтение колонок отчета с потоковой
+распаковкой. Результат печатается в JSON.
+
+Запуск:
+    python benchmarks/compressed_input.py --rows 1000000 --data-dir /tmp/bench
+"""
+import argparse
+import bz2
+import gzip
+import json
+import lzma
+import os
+import shutil
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from reports import StudentPerformanceReport  # noqa: E402
+from reports.inputs import zstd_module  # noqa: E402
+
+from generate_data import generate  # noqa: E402
+from pipeline import consume  # noqa: E402
+
+COMPRESSORS = {
+    "gz": lambda path: gzip.open(path, 'wb', compresslevel=6),
+    "bz2": lambda path: bz2.open(path, 'wb'),
+    "xz": lambda path: lzma.open(path, 'wb', preset=1),
+}
+if zstd_module() is not None:
+    COMPRESSORS["zst"] = lambda path: zstd_module().open(path, 'wb')
+
+
+def compress(source, suffix):
+    """Сжатая копия файла рядом с исходным (переиспользуется)."""
+    path = f"{source}.{suffix}"
+    if not os.path.exists(path):
+        with open(source, 'rb') as f, COMPRESSORS[suffix](path) as out:
+            shutil.copyfileobj(f, out, 1024 * 1024)
+    return path
+
+
+def measure(file, repeat):
+    """Лучшее из repeat время чтения колонок отчета и количество строк."""
+    best, rows = None, 0
+    for _ in range(repeat):
+        started = time.perf_counter()
+        rows = consume(StudentPerformanceReport.iter_records([file]))
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+    return best, rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Чтение сжатых CSV файлов")
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--students", type=int, default=10_000)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--data-dir", default="bench_data")
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    out_dir = os.path.join(args.data_dir, f"compressed_rows{args.rows}_students{args.students}_seed{args.seed}")
+    source = os.path.join(out_dir, f"grades_{args.rows}_000.csv")
+    if not os.path.exists(source):
+        generate(out_dir, args.rows, args.students, seed=args.seed)
+    plain_size = os.path.getsize(source)
+
+    results = []
+    for variant in ["csv", *COMPRESSORS]:
+        file = source if variant == "csv" else compress(source, variant)
+        seconds, rows = measure(file, args.repeat)
+        results.append({
+            "format": variant,
+            "file_bytes": os.path.getsize(file),
+            "seconds": round(seconds, 6),
+            "rows_per_sec": round(rows / seconds),
+            # Пропускная способность по распакованным данным
+            "mb_per_sec": round(plain_size / seconds / 1024 / 1024, 2),
+        })
+    print(json.dumps({"rows": args.rows, "plain_bytes": plain_size, "results": results}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
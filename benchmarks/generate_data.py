@@ -0,0 +1,92 @@
+"""Генерация воспроизводимых синтетических CSV файлов с оценками.
+
+Файлы имеют те же колонки, что и students1.csv. Одинаковые параметры и
+seed всегда дают одинаковые файлы, поэтому замеры на разных коммитах
+сравнимы между собой.
+
+Запуск:
+    python benchmarks/generate_data.py --rows 1000000 --students 50000 \
+        --files 4 --bad-ratio 0.01 --out-dir /tmp/bench
+"""
+import argparse
+import csv
+import os
+import random
+from datetime import date, timedelta
+
+FIELDNAMES = ["student_name", "subject", "teacher_name", "date", "grade"]
+FIRST_NAMES = ["Анна", "Иван", "Елена", "Сергей", "Мария", "Дмитрий", "Ольга", "Павел",
+               "Наталья", "Алексей", "Татьяна", "Владислав", "Ирина", "Михаил", "Светлана"]
+LAST_NAMES = ["Иванов", "Петров", "Семенов", "Титов", "Орлов", "Ковалев", "Смирнов",
+              "Кузнецов", "Попов", "Соколов", "Лебедев", "Козлов", "Новиков", "Морозов"]
+SUBJECTS = ["Математика", "Физика", "Английский язык", "География", "История", "Литература"]
+# Значения оценок, которые отчет пропускает как неверный формат
+BAD_GRADES = ["n/a", "4.5", "пять"]
+START_DATE = date(2023, 9, 1)
+
+
+def student_names(count, rng):
+    """count различных имен студентов."""
+    names = []
+    for index in range(count):
+        first = rng.choice(FIRST_NAMES)
+        last = rng.choice(LAST_NAMES)
+        names.append(f"{last} {first} {index}")
+    return names
+
+
+def iter_rows(rows, students, bad_ratio, rng):
+    """Строки-списки в порядке колонок FIELDNAMES."""
+    names = student_names(students, rng)
+    teachers = student_names(max(1, students // 100), rng)
+    dates = [(START_DATE + timedelta(days=day)).isoformat() for day in range(120)]
+    for _ in range(rows):
+        grade = rng.choice(BAD_GRADES) if rng.random() < bad_ratio else str(rng.randint(1, 5))
+        yield [rng.choice(names), rng.choice(SUBJECTS), rng.choice(teachers),
+               rng.choice(dates), grade]
+
+
+def generate(out_dir, rows, students=1000, files=1, bad_ratio=0.0, seed=0):
+    """Запись rows строк, разделенных поровну между files файлами.
+
+    Возвращает список путей к созданным файлам.
+    """
+    if students < 1 or files < 1:
+        raise ValueError("Количество студентов и файлов должно быть положительным")
+    if not 0 <= bad_ratio <= 1:
+        raise ValueError("Доля неверных строк должна быть в диапазоне [0, 1]")
+
+    rng = random.Random(seed)
+    os.makedirs(out_dir, exist_ok=True)
+    rows_iter = iter_rows(rows, students, bad_ratio, rng)
+    paths = []
+    for index in range(files):
+        part = rows // files + (1 if index < rows % files else 0)
+        path = os.path.join(out_dir, f"grades_{rows}_{index:03d}.csv")
+        with open(path, "w", newline="", encoding="utf-8") as stream:
+            writer = csv.writer(stream, lineterminator="\n")
+            writer.writerow(FIELDNAMES)
+            for _ in range(part):
+                writer.writerow(next(rows_iter))
+        paths.append(path)
+    return paths
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Синтетические CSV файлы с оценками")
+    parser.add_argument("--rows", type=int, default=10_000, help="Общее количество строк")
+    parser.add_argument("--students", type=int, default=1000, help="Количество различных студентов")
+    parser.add_argument("--files", type=int, default=1, help="Количество файлов")
+    parser.add_argument("--bad-ratio", type=float, default=0.0,
+                        help="Доля строк с неверным форматом оценки")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--out-dir", required=True)
+    args = parser.parse_args()
+
+    for path in generate(args.out_dir, args.rows, args.students, args.files,
+                         args.bad_ratio, args.seed):
+        print(path)
+
+
+if __name__ == "__main__":
+    main()
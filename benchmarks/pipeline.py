@@ -0,0 +1,183 @@
+"""Замер времени и памяти по стадиям отчета StudentPerformanceReport.
+
+Стадии: read (чтение колонок), validate (проверка обязательных полей),
+aggregate (свертка в накопители), sort (полная сортировка отчета) и
+render (запись в выбранном формате). Чтение, проверка и свертка потоковые,
+поэтому замеряются как нарастающие конвейеры, а время стадии — разница с
+предыдущим конвейером (pipeline_seconds — время всего конвейера).
+Результат печатается в JSON для сравнения между коммитами.
+
+Запуск на синтетических данных (файлы переиспользуются между запусками):
+    python benchmarks/pipeline.py --rows 10000 1000000 --students 50000 \
+        --bad-ratio 0.01 --data-dir /tmp/bench --output bench.json
+Запуск на своих файлах:
+    python benchmarks/pipeline.py --files students1.csv students2.csv --memory
+"""
+import argparse
+import io
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from reports import StudentPerformanceReport  # noqa: E402
+from reports.writers import WRITERS  # noqa: E402
+
+from generate_data import generate  # noqa: E402
+
+STAGES = ("read", "validate", "aggregate", "sort", "render")
+# Стадии, замеряемые вместе с предыдущей: validate и aggregate заново читают
+# файлы, а запись отчета заново выполняет сортировку
+INCLUDES = {"validate": "read", "aggregate": "validate", "render": "sort"}
+
+
+def consume(records):
+    """Количество элементов итератора."""
+    count = 0
+    for _ in records:
+        count += 1
+    return count
+
+
+def stage_functions(files, output_format):
+    """Функции стадий; каждая получает результат предыдущей стадии отчета."""
+    report_class = StudentPerformanceReport
+
+    def read(_):
+        return consume(report_class.iter_records(files))
+
+    def validate(_):
+        return consume(report_class.validate_records(report_class.iter_records(files)))
+
+    def aggregate(_):
+        return report_class.from_partial(report_class.aggregate(report_class.iter_records(files)))
+
+    def sort(report):
+        report.select()
+        return report
+
+    def render(report):
+        report.write(io.StringIO(), output_format)
+        return report
+
+    return {"read": read, "validate": validate, "aggregate": aggregate,
+            "sort": sort, "render": render}
+
+
+def run_stages(functions, memory=False):
+    """Однократный прогон всех стадий: {стадия: (секунды, пиковые байты или None)}."""
+    results = {}
+    value = None
+    for name in STAGES:
+        if memory:
+            tracemalloc.start()
+        started = time.perf_counter()
+        value = functions[name](value)
+        elapsed = time.perf_counter() - started
+        peak = None
+        if memory:
+            _, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+        results[name] = (elapsed, peak)
+    return results
+
+
+def benchmark(files, repeat=3, memory=False, output_format="csv"):
+    """Лучшее из repeat время по стадиям и, при memory=True, пиковая память.
+
+    Память меряется отдельным прогоном под tracemalloc, чтобы его
+    накладные расходы не попадали в замер времени.
+    """
+    functions = stage_functions(files, output_format)
+    runs = [run_stages(functions) for _ in range(repeat)]
+    peaks = run_stages(functions, memory=True) if memory else {}
+
+    totals = {name: min(run[name][0] for run in runs) for name in STAGES}
+    stages = {}
+    for name in STAGES:
+        own = totals[name] - totals[INCLUDES[name]] if name in INCLUDES else totals[name]
+        stages[name] = {"seconds": round(max(own, 0.0), 6),
+                        "pipeline_seconds": round(totals[name], 6)}
+        if memory:
+            stages[name]["peak_bytes"] = peaks[name][1]
+    return stages
+
+
+def git_commit():
+    """Текущий коммит репозитория или None."""
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True,
+            cwd=os.path.dirname(os.path.abspath(__file__)),
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Замер стадий отчета по успеваемости")
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument("--files", nargs="+", help="Готовые CSV файлы")
+    source.add_argument("--rows", nargs="+", type=int,
+                        help="Размеры синтетических наборов, например 10000 1000000 10000000")
+    parser.add_argument("--students", type=int, default=1000, help="Количество различных студентов")
+    parser.add_argument("--file-count", type=int, default=1, help="Количество файлов в наборе")
+    parser.add_argument("--bad-ratio", type=float, default=0.0,
+                        help="Доля строк с неверным форматом оценки")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--data-dir", default="bench_data",
+                        help="Каталог синтетических наборов (переиспользуется)")
+    parser.add_argument("--repeat", type=int, default=3, help="Количество прогонов по времени")
+    parser.add_argument("--memory", action="store_true", help="Замерить пиковую память стадий")
+    parser.add_argument("--format", choices=sorted(WRITERS), default="csv",
+                        help="Формат стадии render")
+    parser.add_argument("--output", help="Файл для JSON (по умолчанию stdout)")
+    args = parser.parse_args()
+
+    datasets = []
+    if args.files:
+        datasets.append(({"files": args.files}, args.files))
+    else:
+        for rows in args.rows:
+            params = {"rows": rows, "students": args.students, "files": args.file_count,
+                      "bad_ratio": args.bad_ratio, "seed": args.seed}
+            name = "_".join(f"{key}{value}" for key, value in params.items())
+            out_dir = os.path.join(args.data_dir, name)
+            # Имя каталога задается параметрами, поэтому готовый набор не генерируется заново
+            files = sorted(
+                os.path.join(out_dir, file) for file in os.listdir(out_dir)
+            ) if os.path.isdir(out_dir) else []
+            if len(files) != args.file_count:
+                files = generate(out_dir, **params)
+            datasets.append((params, files))
+
+    results = {
+        "commit": git_commit(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "repeat": args.repeat,
+        "format": args.format,
+        "datasets": [],
+    }
+    for params, files in datasets:
+        results["datasets"].append({
+            "params": params,
+            "bytes": sum(os.path.getsize(file) for file in files),
+            "stages": benchmark(files, args.repeat, args.memory, args.format),
+        })
+
+    text = json.dumps(results, ensure_ascii=False, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as stream:
+            stream.write(text + "\n")
+    else:
+        print(text)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,41 @@
+"""Сравнение памяти на строку: словари csv.DictReader и кортежи колонок.
+
+Запуск:
+    python benchmarks/row_memory.py students1.csv students2.csv
+"""
+import argparse
+import os
+import sys
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from reports import StudentPerformanceReport  # noqa: E402
+
+
+def measure(load):
+    """Пиковая память (байт) на удержание всех строк и их количество."""
+    tracemalloc.start()
+    rows = load()
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return current, len(rows)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Память на строку при чтении CSV")
+    parser.add_argument("files", nargs="+")
+    args = parser.parse_args()
+
+    variants = {
+        "dict (DictReader, все колонки)": lambda: list(StudentPerformanceReport.iter_data_from_csv(args.files)),
+        "tuple (только fields отчета)": lambda: list(StudentPerformanceReport.iter_records(args.files)),
+    }
+    for name, load in variants.items():
+        total, count = measure(load)
+        per_row = total / count if count else 0
+        print(f"{name:35} {count:>10} строк {per_row:>10.1f} байт/строка")
+
+
+if __name__ == "__main__":
+    main()
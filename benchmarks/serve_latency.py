@@ -0,0 +1,171 @@
+"""Задержка запросов к серверу отчетов (main.py serve) под нагрузкой.
+
+Сервер запускается отдельным процессом на синтетическом наборе
+(generate_data.py), после первичной свертки к нему в concurrency потоков
+отправляются запросы вперемешку по всем отчетам, форматам и выборкам
+top-N. Для сравнения замеряется один запуск main.py с тем же отчетом.
+Результат (p50/p90/p99 задержки в миллисекундах) печатается в JSON.
+
+Запуск:
+    python benchmarks/serve_latency.py --rows 1000000 --requests 2000 --concurrency 8
+"""
+import argparse
+import http.client
+import itertools
+import json
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import threading
+import time
+
+from generate_data import generate
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+REPORTS = ["students_performance", "subject_performance", "teacher_performance", "monthly_performance"]
+QUERIES = [
+    "format=grid&top=10",
+    "format=jsonl&top=100",
+    "format=csv",
+    "format=tsv&bottom=5",
+    "format=jsonl&offset=2&limit=3",
+]
+
+
+def free_port():
+    """Свободный TCP порт на localhost."""
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def wait_ready(port, process, timeout):
+    """Ожидание первичной свертки; возвращает время готовности в секундах."""
+    started = time.perf_counter()
+    while time.perf_counter() - started < timeout:
+        if process.poll() is not None:
+            raise RuntimeError("Сервер завершился до готовности")
+        try:
+            connection = http.client.HTTPConnection("127.0.0.1", port, timeout=1)
+            connection.request("GET", "/status")
+            status = json.loads(connection.getresponse().read())
+            connection.close()
+            if status["refreshes"]:
+                return time.perf_counter() - started
+        except OSError:
+            pass
+        time.sleep(0.05)
+    raise RuntimeError("Сервер не запустился за отведенное время")
+
+
+def percentile(values, q):
+    """Перцентиль q (0..100) отсортированного списка."""
+    index = min(len(values) - 1, max(0, round(q / 100 * len(values)) - 1))
+    return values[index]
+
+
+def load(port, paths, concurrency):
+    """Задержки запросов paths в миллисекундах, время и число ответов с ошибкой.
+
+    Потоки держат соединение открытым.
+    """
+    latencies = []
+    errors = 0
+    lock = threading.Lock()
+    paths = iter(paths)
+
+    def worker():
+        nonlocal errors
+        connection = http.client.HTTPConnection("127.0.0.1", port)
+        local = []
+        while True:
+            with lock:
+                path = next(paths, None)
+            if path is None:
+                break
+            started = time.perf_counter()
+            connection.request("GET", path)
+            response = connection.getresponse()
+            response.read()
+            local.append((time.perf_counter() - started) * 1000)
+            if response.status != 200:
+                with lock:
+                    errors += 1
+        connection.close()
+        with lock:
+            latencies.extend(local)
+
+    threads = [threading.Thread(target=worker) for _ in range(concurrency)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return sorted(latencies), time.perf_counter() - started, errors
+
+
+def cli_seconds(files):
+    """Время одного запуска main.py с отчетом по успеваемости (top 10)."""
+    started = time.perf_counter()
+    subprocess.run([sys.executable, os.path.join(ROOT, "main.py"), "--files", *files,
+                    "--report", "students_performance", "--top", "10"],
+                   check=True, stdout=subprocess.DEVNULL)
+    return time.perf_counter() - started
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Задержка запросов к серверу отчетов")
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--students", type=int, default=10_000)
+    parser.add_argument("--file-count", type=int, default=4)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--data-dir", default="bench_data")
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--timeout", type=float, default=300, help="Ожидание запуска сервера, секунды")
+    args = parser.parse_args()
+
+    out_dir = os.path.join(args.data_dir, f"serve_rows{args.rows}_students{args.students}"
+                                          f"_files{args.file_count}_seed{args.seed}")
+    files = sorted(os.path.join(out_dir, file) for file in os.listdir(out_dir)) \
+        if os.path.isdir(out_dir) else []
+    if len(files) != args.file_count:
+        files = generate(out_dir, args.rows, args.students, args.file_count, seed=args.seed)
+
+    port = free_port()
+    process = subprocess.Popen([sys.executable, os.path.join(ROOT, "main.py"), "serve",
+                                "--files", *files, "--port", str(port)], stderr=subprocess.DEVNULL)
+    try:
+        ready = wait_ready(port, process, args.timeout)
+        paths = [f"/report/{report}?{query}" for report, query in itertools.product(REPORTS, QUERIES)]
+        # Первые запросы строят ответы, остальные берут их из памяти
+        cold, _, cold_errors = load(port, paths, 1)
+        latencies, elapsed, errors = load(port, itertools.islice(itertools.cycle(paths), args.requests),
+                                  args.concurrency)
+    finally:
+        process.terminate()
+        process.wait()
+
+    print(json.dumps({
+        "rows": args.rows,
+        "files": args.file_count,
+        "startup_seconds": round(ready, 3),
+        "cli_seconds": round(cli_seconds(files), 3),
+        "first_request_ms": {"p50": round(statistics.median(cold), 3), "max": round(cold[-1], 3)},
+        "requests": len(latencies),
+        "errors": cold_errors + errors,
+        "concurrency": args.concurrency,
+        "requests_per_sec": round(len(latencies) / elapsed),
+        "latency_ms": {
+            "p50": round(percentile(latencies, 50), 3),
+            "p90": round(percentile(latencies, 90), 3),
+            "p99": round(percentile(latencies, 99), 3),
+            "max": round(latencies[-1], 3),
+        },
+    }, indent=2))
+
+
+if __name__ == "__main__":
+    main()
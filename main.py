@@ -1,19 +1,204 @@
 import argparse
+import os
 import sys
-from reports import ReportFactory
+from reports import BaseReport, ReportFactory, Validator
+from reports.inputs import expand_paths, read_header
+from reports.snapshot import ROW_GROUP_SIZE, write_snapshot
+from reports.validation import POLICIES
+from reports.writers import WRITERS
+
+OUTPUT_BUFFER_SIZE = 1024 * 1024
+
+
+def output_path(path, report_name, report_count):
+    """Файл отчета: при нескольких отчетах к имени добавляется название отчета."""
+    if report_count == 1:
+        return path
+    root, ext = os.path.splitext(path)
+    return f"{root}.{report_name}{ext}"
+
+
+def non_negative_int(value):
+    """Тип argparse для неотрицательных целых (top, bottom, offset, limit)."""
+    number = int(value)
+    if number < 0:
+        raise argparse.ArgumentTypeError(f"значение не может быть отрицательным: {value}")
+    return number
+
+
+def convert(argv):
+    """Преобразование CSV файлов в двоичный колоночный снимок."""
+    parser = argparse.ArgumentParser(prog="main.py convert",
+                                     description="Преобразование CSV файлов в колоночный снимок")
+    parser.add_argument("--files", nargs='+', required=True,
+                        help="Пути к файлам, каталогам или шаблоны glob")
+    parser.add_argument("--output", required=True, help="Файл снимка (.snap)")
+    parser.add_argument("--row-group-size", type=int, default=ROW_GROUP_SIZE,
+                        help="Количество строк в группе снимка")
+    args = parser.parse_args(argv)
+
+    try:
+        files = list(expand_paths(args.files))
+        if not files:
+            raise ValueError("Не найдены входные CSV файлы для преобразования.")
+        # Колонки снимка берутся из заголовка первого файла; они должны быть во всех файлах
+        columns = read_header(files[0])
+        rows = write_snapshot(args.output, columns, BaseReport.iter_records(files, columns),
+                              args.row_group_size)
+        print(f"Записано строк: {rows} в '{args.output}'")
+    except FileNotFoundError as e:
+        print(f"Error: {e}")
+        sys.exit(1)
+    except ValueError as e:
+        print(f"Error: {e}")
+        sys.exit(1)
+    except Exception as e:
+        print(f"An unexpected error occurred: {e}")
+        sys.exit(1)
+
+
+def serve(argv):
+    """Сервер отчетов с данными в памяти и обновлением измененных файлов."""
+    from reports import server
+
+    parser = argparse.ArgumentParser(prog="main.py serve",
+                                     description="Сервер отчетов по HTTP или Unix сокету")
+    parser.add_argument("--files", nargs='+', required=True,
+                        help="Пути к файлам, каталогам или шаблоны glob")
+    parser.add_argument("--report", nargs='+', default=None,
+                        help="Отчеты сервера (по умолчанию все зарегистрированные)")
+    parser.add_argument("--host", default="127.0.0.1", help="Адрес HTTP сервера")
+    parser.add_argument("--port", type=int, default=8000, help="Порт HTTP сервера")
+    parser.add_argument("--socket", help="Unix сокет вместо TCP порта")
+    parser.add_argument("--interval", type=float, default=server.DEFAULT_INTERVAL,
+                        help="Период опроса файлов в секундах")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="Количество процессов для свертки измененных файлов")
+    parser.add_argument("--reader", choices=["csv", "mmap", "async"], default="csv",
+                        help="Способ чтения файлов")
+    parser.add_argument("--validation", choices=POLICIES, default="default",
+                        help="Политика для неверных строк")
+    parser.add_argument("--max-errors", type=int, help="Максимум неверных строк")
+    parser.add_argument("--max-error-ratio", type=float, help="Максимальная доля неверных строк")
+    args = parser.parse_args(argv)
+
+    try:
+        validator = Validator(args.validation, max_errors=args.max_errors, max_ratio=args.max_error_ratio)
+        store = server.ReportStore(args.report or ReportFactory.report_names(), args.files,
+                                   workers=args.workers, reader=args.reader, validator=validator)
+        address = args.socket or f"http://{args.host}:{args.port}"
+        print(f"Отчеты {', '.join(store.report_names)} доступны по адресу {address}", file=sys.stderr)
+        server.serve(store, args.host, args.port, args.socket, args.interval)
+    except KeyboardInterrupt:
+        pass
+    except FileNotFoundError as e:
+        print(f"Error: {e}")
+        sys.exit(1)
+    except ValueError as e:
+        print(f"Error: {e}")
+        sys.exit(1)
+    except Exception as e:
+        print(f"An unexpected error occurred: {e}")
+        sys.exit(1)
 
 
 def main():
+    if sys.argv[1:2] == ["convert"]:
+        return convert(sys.argv[2:])
+    if sys.argv[1:2] == ["serve"]:
+        return serve(sys.argv[2:])
+
     parser = argparse.ArgumentParser(description='Генерация отчета')
-    parser.add_argument("--files", nargs='+',required=True, help="Путь к файлам")
-    parser.add_argument("--report", required=True, help="Выберите отчет:")
+    parser.add_argument("--files", nargs='+',required=True,
+                        help="Пути к файлам, каталогам или шаблоны glob (поддерживаются .gz, .bz2, .xz, .zst)")
+    parser.add_argument("--report", nargs='+', required=True,
+                        help="Выберите отчеты (несколько отчетов строятся за один проход по файлам)")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="Количество процессов для параллельного чтения файлов")
+    parser.add_argument("--engine", choices=["python", "numpy"], default="python",
+                        help="Движок агрегации (numpy при наличии библиотеки)")
+    parser.add_argument("--reader", choices=["csv", "mmap", "async"], default="csv",
+                        help="Способ чтения файлов (mmap делит большие файлы между процессами, "
+                             "async читает много файлов одновременно)")
+    parser.add_argument("--concurrency", type=int, default=16,
+                        help="Максимум одновременно читаемых файлов для --reader async")
+    parser.add_argument("--cache-dir", help="Каталог кэша разобранных файлов")
+    parser.add_argument("--cache-size", type=int, default=256,
+                        help="Максимальный размер кэша в МБ")
+    parser.add_argument("--cache-hash", action="store_true",
+                        help="Учитывать хэш содержимого файла в ключе кэша")
+    parser.add_argument("--state-file",
+                        help="Файл состояния для инкрементального разбора дописываемых файлов")
+    selection = parser.add_mutually_exclusive_group()
+    selection.add_argument("--top", type=non_negative_int, help="Показать N лучших студентов")
+    selection.add_argument("--bottom", type=non_negative_int, help="Показать N худших студентов")
+    parser.add_argument("--offset", type=non_negative_int, default=0, help="Пропустить первые N строк")
+    parser.add_argument("--limit", type=non_negative_int, help="Показать не более N строк")
+    parser.add_argument("--format", choices=sorted(WRITERS), default="grid",
+                        help="Формат вывода (grid — таблица для терминала)")
+    parser.add_argument("--output", help="Файл для вывода отчета (по умолчанию stdout)")
+    parser.add_argument("--profile", action="store_true",
+                        help="Вывести в stderr JSON с замерами стадий и файлов")
+    parser.add_argument("--profile-output", help="Файл для JSON с замерами (включает --profile)")
+    parser.add_argument("--pstats", help="Файл для статистики cProfile профилируемой стадии")
+    parser.add_argument("--pstats-stage", choices=["aggregate", "merge", "sort", "render"],
+                        default="aggregate", help="Стадия для cProfile")
+    parser.add_argument("--validation", choices=POLICIES, default="default",
+                        help="Политика для неверных строк (default пропускает только неверный формат, "
+                             "strict прерывает на первой, skip пропускает все, budget — до лимита)")
+    parser.add_argument("--max-errors", type=int,
+                        help="Максимум неверных строк, после которого отчет прерывается")
+    parser.add_argument("--max-error-ratio", type=float,
+                        help="Максимальная доля неверных строк (например, 0.01)")
+    parser.add_argument("--rejects", help="Файл JSON Lines для примеров отклоненных строк")
+    parser.add_argument("--memory-limit", type=int,
+                        help="Лимит памяти таблицы группировки в МБ; сверх него данные выгружаются на диск")
+    parser.add_argument("--spill-dir", help="Каталог временных файлов для --memory-limit")
 
     args = parser.parse_args()
 
+    validator = None
     try:
-        report = ReportFactory.create_report(args.report, args.files)
-        result = report.generate()
-        print(result)
+        validator = Validator(args.validation, max_errors=args.max_errors, max_ratio=args.max_error_ratio)
+        cache = None
+        if args.cache_dir:
+            from reports.cache import PartialCache
+            cache = PartialCache(args.cache_dir, max_bytes=args.cache_size * 1024 * 1024,
+                                 content_hash=args.cache_hash)
+        incremental = None
+        if args.state_file:
+            from reports.incremental import IncrementalState
+            incremental = IncrementalState(args.state_file)
+        metrics = None
+        if args.profile or args.profile_output or args.pstats:
+            from reports.metrics import Metrics
+            metrics = Metrics(profile_stage=args.pstats_stage if args.pstats else None)
+        memory_limit = args.memory_limit * 1024 * 1024 if args.memory_limit else None
+        reports = ReportFactory.create_reports(args.report, args.files, workers=args.workers,
+                                               engine=args.engine, cache=cache,
+                                               incremental=incremental, reader=args.reader,
+                                               metrics=metrics, concurrency=args.concurrency,
+                                               validator=validator, memory_limit=memory_limit,
+                                               spill_dir=args.spill_dir)
+        selection = dict(top=args.top, bottom=args.bottom, offset=args.offset, limit=args.limit)
+        for index, (report_name, report) in enumerate(zip(args.report, reports)):
+            if args.output:
+                with open(output_path(args.output, report_name, len(reports)), 'w', newline='',
+                          buffering=OUTPUT_BUFFER_SIZE) as stream:
+                    report.write(stream, args.format, metrics=metrics, **selection)
+            else:
+                if index:
+                    sys.stdout.write("\n")
+                report.write(sys.stdout, args.format, metrics=metrics, **selection)
+            report.close()
+
+        if args.pstats:
+            metrics.dump_profile(args.pstats)
+        if args.profile_output:
+            with open(args.profile_output, 'w') as stream:
+                metrics.dump(stream)
+        elif args.profile:
+            metrics.dump(sys.stderr)
     except FileNotFoundError as e:
         print(f"Error: {e}")
         sys.exit(1)
@@ -23,6 +208,13 @@ def main():
     except Exception as e:
         print(f"An unexpected error occurred: {e}")
         sys.exit(1)
+    finally:
+        if validator is not None and validator.rejected:
+            print(f"Отклонено строк: {validator.rejected} из {validator.rows} "
+                  f"({', '.join(f'{key}: {count}' for key, count in sorted(validator.errors.items()))})",
+                  file=sys.stderr)
+        if validator is not None and args.rejects:
+            validator.write_rejects(args.rejects)
 
 
 if __name__ == "__main__":
@@ -1,4 +1,40 @@
+"""Отчеты по успеваемости.
+
+Модули отчетов и тяжелых частей пакета (кэш, инкрементальный режим,
+метрики) импортируются при первом обращении: отчеты регистрируются на
+фабрике путем "модуль:Класс", а имена пакета загружаются через
+__getattr__. Поэтому запуск main.py не платит за импорт неиспользуемых
+отчетов и зависимостей.
+"""
+import importlib
+
 from .base_report import BaseReport, ReportFactory
-from .students_performance import StudentPerformanceReport
+from .validation import Validator
+
+# Имя пакета -> модуль, из которого оно загружается при первом обращении
+_LAZY = {
+    "GroupByReport": ".groupby",
+    "IncrementalState": ".incremental",
+    "Metrics": ".metrics",
+    "MonthlyPerformanceReport": ".monthly_performance",
+    "PartialCache": ".cache",
+    "StudentPerformanceReport": ".students_performance",
+    "SubjectPerformanceReport": ".subject_performance",
+    "TeacherPerformanceReport": ".teacher_performance",
+}
+
+__all__ = ["BaseReport", "ReportFactory", "Validator", *_LAZY]
+
+ReportFactory.register("students_performance", f"{__name__}.students_performance:StudentPerformanceReport")
+ReportFactory.register("subject_performance", f"{__name__}.subject_performance:SubjectPerformanceReport")
+ReportFactory.register("teacher_performance", f"{__name__}.teacher_performance:TeacherPerformanceReport")
+ReportFactory.register("monthly_performance", f"{__name__}.monthly_performance:MonthlyPerformanceReport")
+
 
-ReportFactory.register("students_performance", StudentPerformanceReport)
+def __getattr__(name):
+    module = _LAZY.get(name)
+    if module is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(module, __name__), name)
+    globals()[name] = value
+    return value
@@ -1,50 +1,585 @@
 from abc import ABC, abstractmethod
+from contextlib import contextmanager, nullcontext
+from functools import partial
+from itertools import chain, islice
+from operator import itemgetter
 import csv
+import importlib
+import os
+
+from . import async_reader, chunked, inputs, snapshot
+from .validation import ScanValidator, Validator, validated
+from .writers import WRITERS
+
+# Количество строк, которое общий проход передает отчетам за раз
+SCAN_BATCH_SIZE = 8192
+# Группа entry points, через которую пакеты регистрируют свои отчеты
+ENTRY_POINT_GROUP = "csv_reader.reports"
+
+
+@contextmanager
+def file_errors(file):
+    """Перевод ошибок чтения в сообщения с именем файла.
+
+    Ошибки валидации данных (ValueError) пробрасываются без изменений.
+    """
+    try:
+        yield
+    except FileNotFoundError:
+        raise FileNotFoundError(f"Файл '{file}' не найден.")
+    except csv.Error as e:
+        raise csv.Error(f"Ошибка в файле '{file}': {e}") from e
+    except UnicodeError as e:
+        raise Exception(f"Неизвестная ошибка при чтении файла '{file}': {e}") from e
+    except ValueError:
+        raise
+    except Exception as e:
+        raise Exception(f"Неизвестная ошибка при чтении файла '{file}': {e}") from e
+
+
+def check_selection(top=None, bottom=None, offset=0, limit=None):
+    """Проверка параметров выборки строк отчета (select/rows)."""
+    if top is not None and bottom is not None:
+        raise ValueError("Нельзя одновременно задать top и bottom")
+    for name, value in (("top", top), ("bottom", bottom), ("offset", offset), ("limit", limit)):
+        if value is not None and value < 0:
+            raise ValueError(f"Значение {name} не может быть отрицательным: {value}")
+
+
+def project_records(reader, fields, source, header=None):
+    """Выборка нужных колонок из строк csv.reader в виде кортежей.
+
+    Индексы колонок определяются по заголовку один раз на файл; отсутствие
+    колонки в заголовке — ошибка всего файла. Пустые строки пропускаются,
+    а недостающие в коротких строках поля считаются пустыми.
+    """
+    if header is None:
+        header = next(reader, None)
+        if header is None:
+            return
+    for field in fields:
+        if field not in header:
+            raise ValueError(f"Поле {field} отсутствует в заголовке файла '{source}'")
+
+    indices = [header.index(field) for field in fields]
+    getter = itemgetter(*indices) if len(indices) > 1 else (lambda row: (row[indices[0]],))
+    for row in reader:
+        try:
+            record = getter(row)
+        except IndexError:
+            if not row:
+                continue
+            record = tuple(row[index] if index < len(row) else "" for index in indices)
+        yield record
+
+
+def measure(metrics, stage, file=None):
+    """Замер стадии при заданном metrics, иначе пустой контекст."""
+    if metrics is None:
+        return nullcontext({})
+    return metrics.stage(stage, file)
+
+
+def field_getter(fields, columns):
+    """Функция выборки кортежа колонок columns из кортежа со значениями fields."""
+    indices = [fields.index(column) for column in columns]
+    if len(indices) == 1:
+        return lambda record: (record[indices[0]],)
+    return itemgetter(*indices)
+
+
+def scan_fields(report_classes):
+    """Объединенные колонки нескольких отчетов в порядке первого упоминания."""
+    return tuple(dict.fromkeys(field for report_class in report_classes
+                               for field in report_class.fields))
+
+
+def scan_files(report_classes, files, reader="csv", validator=None):
+    """Частичные результаты нескольких отчетов за один проход по файлам.
+
+    Читаются объединенные колонки всех отчетов, поэтому каждая строка
+    разбирается один раз.
+    """
+    records = BaseReport.iter_records(files, scan_fields(report_classes), reader)
+    return scan_records(report_classes, records, validator)
+
+
+def scan_file(report_classes, file, reader="csv", validator=None):
+    """Частичные результаты нескольких отчетов по одному файлу (может выполняться в отдельном процессе)."""
+    return scan_files(report_classes, [file], reader, validator)
+
+
+def scan_records(report_classes, records, validator=None):
+    """Свертка кортежей объединенных колонок (scan_fields) для нескольких отчетов.
+
+    Пачки строк передаются в aggregate каждого отчета, который
+    досворачивает их в свой частичный результат. Каждый отчет проверяет
+    свои колонки, но validator считает входные строки: строка учитывается
+    один раз и отклоняется не более одного раза (ScanValidator), поэтому
+    лимиты и доля ошибок относятся к строкам файлов.
+    """
+    if validator is None:
+        validator = Validator()
+    shared = ScanValidator(validator)
+    fields = scan_fields(report_classes)
+    getters = [field_getter(fields, report_class.fields) for report_class in report_classes]
+    partials = [report_class.aggregate(()) for report_class in report_classes]
+
+    while batch := list(islice(records, SCAN_BATCH_SIZE)):
+        shared.start_batch(len(batch))
+        for index, (report_class, getter) in enumerate(zip(report_classes, getters)):
+            shared.rewind()
+            partials[index] = report_class.aggregate(map(getter, batch), partials[index], shared)
+    return partials
 
 
 class BaseReport(ABC):
     """Базовый класс для отчетов."""
 
+    # Колонки, которые нужны отчету; из файлов читаются только они
+    fields = ()
+
     @abstractmethod
     def generate(self):
         """Генерация отчета."""
         pass
 
+    def write(self, stream, output_format="grid", metrics=None, **selection):
+        """Потоковая запись отчета в выбранном формате.
+
+        Строки берутся из rows() и передаются писателю по одной, без
+        промежуточной строки со всей таблицей. При заданном metrics (Metrics)
+        замеряются стадии "sort" (выборка строк) и "render" (запись).
+        """
+        if output_format not in WRITERS:
+            raise ValueError(f"Формат '{output_format}' не поддерживается.")
+
+        with measure(metrics, "sort"):
+            rows = iter(self.rows(**selection))
+            first = next(rows, None)
+        if first is None:
+            raise ValueError("Нет данных для отчета")
+        with measure(metrics, "render"):
+            WRITERS[output_format](stream, self.headers, chain((first,), rows))
+
+    def close(self):
+        """Освобождение ресурсов отчета (например, временных файлов)."""
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    @classmethod
+    def iter_data_from_csv(cls, files):
+        """Потоковое чтение данных из CSV файлов.
+
+        Строки отдаются по одной по мере чтения, поэтому в памяти
+        одновременно находится только текущая строка. Каталоги и шаблоны
+        раскрываются, сжатые файлы распаковываются потоково (inputs).
+        """
+        for file in inputs.expand_paths(files):
+            with file_errors(file), inputs.open_text(file) as csvfile:
+                reader = csv.DictReader(csvfile)
+                yield from reader
+
     @classmethod
     def read_data_from_csv(cls, files):
         """Чтение данных из CSV файлов."""
-        data = []
-        for file in files:
-            try:
-                with open(file, 'r') as csvfile:
-                    reader = csv.DictReader(csvfile)
-                    data.extend(list(reader))
-            except FileNotFoundError:
-                raise FileNotFoundError(f"Файл '{file}' не найден.")
-            except csv.Error as e:
-                raise csv.Error(f"Ошибка в файле '{file}': {e}") from e
-            except Exception as e:
-                raise Exception(f"Неизвестная ошибка при чтении файла '{file}': {e}") from e
-
-        return data
+        return list(cls.iter_data_from_csv(files))
+
+    @classmethod
+    def iter_records(cls, files, fields=None, reader="csv"):
+        """Потоковое чтение только нужных отчету колонок.
+
+        Вместо словаря на каждую строку отдается кортеж значений колонок
+        fields (по умолчанию cls.fields). reader="mmap" читает файл через mmap
+        (сжатые файлы читаются потоково). Снимки (snapshot) читаются через
+        mmap с декодированием только колонок fields. Словарь DictReader с пятью полями
+        занимает около 366 байт на строку, кортеж из двух полей — около
+        126 байт (benchmarks/row_memory.py, 1 млн строк).
+        """
+        fields = cls.fields if fields is None else fields
+        for file in inputs.expand_paths(files):
+            if snapshot.is_snapshot(file):
+                with file_errors(file):
+                    yield from snapshot.iter_records(file, fields)
+                continue
+            if reader == "mmap" and inputs.is_plain_text(file):
+                with file_errors(file):
+                    header, ranges = chunked.split_file(file, 1)
+                    for start, end in ranges:
+                        rows = chunked.iter_range_rows(file, start, end)
+                        yield from project_records(rows, fields, file, header)
+                continue
+            with file_errors(file), inputs.open_text(file) as csvfile:
+                yield from project_records(csv.reader(csvfile), fields, file)
+
+    @classmethod
+    def aggregate_range(cls, file, start, end, header, exact=False, validator=None):
+        """Свертка диапазона целевых смещений файла (может выполняться в отдельном процессе).
+
+        Возвращает границы записей диапазона (chunked.range_bounds) и
+        частичный результат. Если начало угадано (exact ложно), ошибка
+        свертки возвращается вместо результата: при неверной догадке строки
+        диапазона — мусор, и ошибка возбуждается только после проверки
+        начала при объединении.
+        """
+        with file_errors(file):
+            bounds = chunked.range_bounds(file, start, end, exact)
+        try:
+            with file_errors(file):
+                rows = chunked.iter_range_rows(file, *bounds)
+                return bounds, cls.aggregate(project_records(rows, cls.fields, file, header), validator=validator)
+        except (ValueError, csv.Error) as e:
+            if exact:
+                raise
+            return bounds, e
+
+    @classmethod
+    def aggregate(cls, records, partial=None, validator=None):
+        """Свертка кортежей колонок fields в компактный частичный результат отчета.
+
+        Если задан partial, записи досворачиваются в него. О неверных
+        строках сообщается validator (Validator), который по своей политике
+        прерывает свертку или пропускает строку; validator.rows
+        увеличивается на каждую запись до сообщения о ней.
+        """
+        raise NotImplementedError(f"Отчет {cls.__name__} не поддерживает частичную агрегацию.")
+
+    @classmethod
+    def merge_partials(cls, partials):
+        """Объединение частичных результатов в один."""
+        raise NotImplementedError(f"Отчет {cls.__name__} не поддерживает частичную агрегацию.")
+
+    @classmethod
+    def merge_into(cls, totals, partial):
+        """Добавление частичного результата partial к totals на месте."""
+        raise NotImplementedError(f"Отчет {cls.__name__} не поддерживает объединение на месте.")
+
+    @classmethod
+    def from_partial(cls, partial):
+        """Создание отчета из готового частичного результата."""
+        raise NotImplementedError(f"Отчет {cls.__name__} не поддерживает частичную агрегацию.")
+
+    @classmethod
+    def aggregate_file(cls, file, engine="python", validator=None):
+        """Чтение и свертка одного файла (может выполняться в отдельном процессе).
+
+        Базовая реализация поддерживает только построчный движок.
+        """
+        return cls.aggregate(cls.iter_records([file]), validator=validator)
 
 
 class ReportFactory:
-    """Фабрика отчетов."""
+    """Фабрика отчетов.
+
+    Отчет регистрируется классом или путем "модуль:Класс"; модуль по пути
+    импортируется только при первом обращении к отчету, поэтому запуск
+    не зависит от количества зарегистрированных отчетов. Отчеты других
+    пакетов подключаются через entry points группы ENTRY_POINT_GROUP.
+    """
 
     _reports = {}
+    _entry_points_loaded = False
 
     @classmethod
     def register(cls, report_name, report_class):
-        """Регистрация отчета."""
+        """Регистрация отчета (класс или путь "модуль:Класс")."""
         cls._reports[report_name] = report_class
 
     @classmethod
-    def create_report(cls, report_name, files):
-        """Создание отчета."""
+    def _load_entry_points(cls):
+        """Регистрация отчетов из entry points (один раз, явная регистрация важнее)."""
+        if cls._entry_points_loaded:
+            return
+        cls._entry_points_loaded = True
+        from importlib.metadata import entry_points
+        for entry_point in entry_points(group=ENTRY_POINT_GROUP):
+            cls._reports.setdefault(entry_point.name, entry_point.value)
+
+    @classmethod
+    def report_names(cls):
+        """Названия зарегистрированных отчетов."""
+        cls._load_entry_points()
+        return sorted(cls._reports)
+
+    @classmethod
+    def report_class(cls, report_name):
+        """Класс зарегистрированного отчета; модуль отчета импортируется при первом обращении."""
+        if report_name not in cls._reports:
+            cls._load_entry_points()
         if report_name not in cls._reports:
             raise ValueError(f"Отчет '{report_name}' не зарегистрирован.")
-
         report_class = cls._reports[report_name]
-        data = report_class.read_data_from_csv(files)
-        return report_class(data)
+        if isinstance(report_class, str):
+            module, _, name = report_class.partition(":")
+            report_class = cls._reports[report_name] = getattr(importlib.import_module(module), name)
+        return report_class
+
+    @classmethod
+    def create_report(cls, report_name, files, workers=1, engine="python", cache=None,
+                      incremental=None, reader="csv", metrics=None,
+                      concurrency=async_reader.DEFAULT_CONCURRENCY, validator=None,
+                      memory_limit=None, spill_dir=None):
+        """Создание отчета.
+
+        При workers > 1 каждый файл читается и сворачивается в отдельном
+        процессе, а частичные результаты объединяются в родительском.
+        Параметр engine выбирает движок агрегации ("python" или "numpy"),
+        cache (PartialCache) позволяет не разбирать неизмененные файлы повторно,
+        а incremental (IncrementalState) — разбирать только дописанные строки
+        (последовательно движком python, без cache и с reader="csv").
+        reader="mmap" включает чтение файлов через mmap по диапазонам байт,
+        reader="async" — конкурентное чтение не более concurrency файлов сразу.
+        metrics (Metrics) получает замеры стадий "aggregate" и "merge";
+        при последовательном чтении свертка замеряется по каждому файлу.
+        files может содержать каталоги и шаблоны glob (inputs.expand_paths).
+        validator (Validator) задает политику для неверных строк и собирает
+        их счетчики; cache хранит результаты отдельно для каждой политики
+        вместе со счетчиками файла, которые добавляются к validator.
+        memory_limit (байты) включает внешнюю агрегацию (external): таблица
+        накопителей сверх лимита выгружается частями во временные файлы в
+        spill_dir, а строки отчета сортируются внешним слиянием.
+        """
+        report_class = cls.report_class(report_name)
+        validator = Validator() if validator is None else validator
+        files = inputs.expand_paths(files)
+        if incremental is not None and (workers > 1 or engine != "python" or cache is not None
+                                        or reader != "csv"):
+            raise ValueError("Инкрементальный режим поддерживается только для последовательной "
+                             "свертки движком python без кэша и с чтением csv.")
+        if memory_limit is not None:
+            if incremental is not None or workers > 1 or engine != "python" or cache is not None \
+                    or reader == "async":
+                raise ValueError("Ограничение памяти поддерживается только для последовательной "
+                                 "свертки движком python без кэша, инкрементального режима "
+                                 "и асинхронного чтения.")
+            from . import external
+            with measure(metrics, "aggregate"):
+                report = external.aggregate_external(
+                    report_class, report_class.iter_records(files, reader=reader),
+                    memory_limit, spill_dir, validator,
+                )
+            validator.check_budget(final=True)
+            return report
+        if incremental is None and metrics is None and workers == 1 and engine == "python" \
+                and cache is None and reader == "csv":
+            # Последовательное чтение: пути раскрываются по мере обхода
+            partial = report_class.aggregate(report_class.iter_records(files), validator=validator)
+            validator.check_budget(final=True)
+            return report_class.from_partial(partial)
+
+        files = list(files)
+        if incremental is not None:
+            partials = []
+            for file in files:
+                with file_errors(file), measure(metrics, "aggregate", file):
+                    partials.append(incremental.aggregate_file(report_class, file, validator))
+            incremental.save()
+        elif workers > 1 or engine != "python" or cache is not None or reader != "csv":
+            with measure(metrics, "aggregate") as record:
+                partials = cls.aggregate_files(report_class, files, workers, engine, cache, reader,
+                                               concurrency, validator)
+                record["bytes"] = sum(os.path.getsize(file) for file in files)
+        else:
+            partials = []
+            for file in files:
+                with metrics.stage("aggregate", file) as record:
+                    records = metrics.counted(record, report_class.iter_records([file]))
+                    partials.append(report_class.aggregate(records, validator=validator))
+                    record["bytes"] = os.path.getsize(file)
+        validator.check_budget(final=True)
+
+        with measure(metrics, "merge"):
+            return report_class.from_partial(report_class.merge_partials(partials))
+
+    @classmethod
+    def create_reports(cls, report_names, files, workers=1, engine="python", cache=None,
+                       incremental=None, reader="csv", metrics=None,
+                       concurrency=async_reader.DEFAULT_CONCURRENCY, validator=None,
+                       memory_limit=None, spill_dir=None):
+        """Создание нескольких отчетов за один проход по файлам.
+
+        Один отчет создается через create_report со всеми параметрами. Для
+        нескольких отчетов каждый файл разбирается один раз (scan_files),
+        при workers > 1 — в отдельном процессе; cache хранит частичные
+        результаты всего набора отчетов. Движок numpy и инкрементальный
+        режим, а также ограничение памяти (memory_limit) поддерживаются
+        только для одного отчета. Строки проверяются
+        каждым отчетом по своим колонкам, а счетчики validator учитывают
+        каждую входную строку один раз (scan_records).
+        """
+        report_classes = [cls.report_class(report_name) for report_name in report_names]
+        if len(report_names) == 1:
+            return [cls.create_report(report_names[0], files, workers, engine, cache,
+                                      incremental, reader, metrics, concurrency, validator,
+                                      memory_limit, spill_dir)]
+        if engine != "python" or incremental is not None or memory_limit is not None:
+            raise ValueError("Движок numpy, инкрементальный режим и ограничение памяти "
+                             "поддерживаются только для одного отчета.")
+        files = list(inputs.expand_paths(files))
+        validator = Validator() if validator is None else validator
+
+        with measure(metrics, "aggregate") as record:
+            partials = cls.scan_partials(report_classes, files, workers, cache, reader, concurrency, validator)
+            record["bytes"] = sum(os.path.getsize(file) for file in files)
+        validator.check_budget(final=True)
+
+        with measure(metrics, "merge"):
+            return [
+                report_class.from_partial(report_class.merge_partials(
+                    [file_partials[position] for file_partials in partials]
+                ))
+                for position, report_class in enumerate(report_classes)
+            ]
+
+    @classmethod
+    def scan_partials(cls, report_classes, files, workers=1, cache=None, reader="csv",
+                      concurrency=async_reader.DEFAULT_CONCURRENCY, validator=None):
+        """Частичные результаты нескольких отчетов по каждому файлу (scan_files).
+
+        Для каждого файла возвращается список частичных результатов в порядке
+        report_classes; файлы перечисляются в исходном порядке.
+        """
+        validator = Validator() if validator is None else validator
+        namespace = "+".join(f"{report_class.__module__}.{report_class.__qualname__}"
+                             for report_class in report_classes)
+        fields = scan_fields(report_classes)
+
+        def scan_lines(file, lines, validator=None):
+            return scan_records(report_classes, project_records(csv.reader(lines), fields, file), validator)
+
+        return cls._file_partials(
+            namespace, files, partial(scan_file, report_classes, reader=reader), scan_lines,
+            workers, cache, reader, concurrency, validator,
+        )
+
+    @classmethod
+    def aggregate_files(cls, report_class, files, workers=1, engine="python", cache=None,
+                        reader="csv", concurrency=async_reader.DEFAULT_CONCURRENCY, validator=None):
+        """Частичные результаты по каждому файлу в порядке перечисления файлов.
+
+        При reader="mmap" файлы делятся на диапазоны байт по границам
+        записей, поэтому даже один большой файл разбирается всеми процессами.
+        При reader="async" файлы читаются конкурентно в потоках, а разбор
+        идет построчным движком в текущем процессе. Счетчики неверных строк
+        из дочерних процессов добавляются к validator.
+        """
+        validator = Validator() if validator is None else validator
+        namespace = f"{report_class.__module__}.{report_class.__qualname__}"
+
+        def aggregate_lines(file, lines, validator=None):
+            return report_class.aggregate(
+                project_records(csv.reader(lines), report_class.fields, file), validator=validator
+            )
+
+        def aggregate_ranges(plain):
+            targets, tasks = [], []
+            for file in plain:
+                with file_errors(file):
+                    header, ranges = chunked.split_file(file, workers)
+                targets.append((file, header, ranges))
+                tasks.extend((file, start, end, header, index == 0) for index, (start, end) in enumerate(ranges))
+            results = iter(cls._map(partial(validated, report_class.aggregate_range, validator), tasks, workers))
+
+            def unpack(result):
+                (bounds, range_partial), child = result
+                return bounds, (range_partial, child)
+
+            file_partials = []
+            for file, header, ranges in targets:
+                # Диапазон, начало которого угадано неверно, сворачивается
+                # заново в этом процессе от конца предыдущего диапазона
+                def redo(start, end):
+                    return unpack(validated(report_class.aggregate_range, validator, file, start, end, header, True))
+
+                joined = chunked.join_ranges(ranges, [unpack(next(results)) for _ in ranges], redo)
+                range_partials, file_validator = [], validator.spawn()
+                for _, (range_partial, child) in joined:
+                    if isinstance(range_partial, Exception):
+                        raise range_partial
+                    range_partials.append(range_partial)
+                    file_validator.merge(child)
+                file_partials.append((report_class.merge_partials(range_partials), file_validator))
+            return file_partials
+
+        return cls._file_partials(
+            namespace, files, partial(report_class.aggregate_file, engine=engine), aggregate_lines,
+            workers, cache, reader, concurrency, validator, aggregate_ranges,
+        )
+
+    @classmethod
+    def _file_partials(cls, namespace, files, aggregate_file, aggregate_lines, workers=1, cache=None,
+                       reader="csv", concurrency=async_reader.DEFAULT_CONCURRENCY, validator=None,
+                       aggregate_ranges=None):
+        """Общий порядок свертки файлов по одному для aggregate_files и scan_partials.
+
+        Результаты неизмененных файлов берутся из cache (записи пространства
+        имен namespace), остальные файлы сворачиваются функцией
+        aggregate_file(file, validator=...) последовательно или в пуле
+        процессов и сохраняются в cache. При reader="async" текстовые файлы
+        читаются конкурентно и сворачиваются aggregate_lines(file, lines,
+        validator=...), а при reader="mmap" несжатые файлы передаются
+        списком в aggregate_ranges, если она задана; она возвращает пары
+        (частичный результат, валидатор файла).
+
+        Каждый файл проверяется отдельным валидатором, который хранится в
+        cache вместе с частичным результатом, поэтому счетчики и примеры
+        отклоненных строк файлов из cache тоже добавляются к validator.
+        """
+        validator = Validator() if validator is None else validator
+        # Частичный результат зависит от политики (skip пропускает строки, на
+        # которых strict прерывается), поэтому записи политик не смешиваются
+        namespace = f"{namespace}:{validator.policy}"
+        results = [None] * len(files)
+        pending = []
+        # Ключи вычисляются один раз до чтения файлов и используются при сохранении
+        keys = {}
+        for index, file in enumerate(files):
+            if cache is not None:
+                with file_errors(file):
+                    keys[index] = cache.key(file, namespace)
+                    results[index] = cache.get(file, namespace, keys[index])
+            if results[index] is None:
+                pending.append(index)
+
+        computed = {}
+        if reader == "mmap" and aggregate_ranges is not None:
+            # Сжатые файлы и снимки не делятся на диапазоны
+            plain = [index for index in pending if inputs.is_plain_text(files[index])]
+            computed.update(zip(plain, aggregate_ranges([files[index] for index in plain])))
+        elif reader == "async":
+            # Снимки не читаются как текст
+            texts = [index for index in pending if not snapshot.is_snapshot(files[index])]
+            computed.update(zip(texts, async_reader.map_files(
+                partial(validated, aggregate_lines, validator),
+                [files[index] for index in texts], concurrency, file_errors,
+            )))
+
+        rest = [index for index in pending if index not in computed]
+        computed.update(zip(rest, cls._map(
+            partial(validated, aggregate_file, validator), [(files[index],) for index in rest], workers
+        )))
+
+        for index in pending:
+            results[index] = computed[index]
+            if cache is not None:
+                cache.put(files[index], namespace, computed[index], keys[index])
+
+        partials = []
+        for file_partial, file_validator in results:
+            validator.merge(file_validator)
+            partials.append(file_partial)
+        return partials
+
+    @staticmethod
+    def _map(function, tasks, workers):
+        """Выполнение задач последовательно или в пуле процессов с сохранением порядка."""
+        if workers > 1 and len(tasks) > 1:
+            from concurrent.futures import ProcessPoolExecutor
+            with ProcessPoolExecutor(max_workers=min(workers, len(tasks))) as executor:
+                # map сохраняет порядок задач, поэтому результат совпадает с последовательным
+                return list(executor.map(function, *zip(*tasks)))
+        return [function(*task) for task in tasks]
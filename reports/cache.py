@@ -0,0 +1,107 @@
+import hashlib
+import os
+import pickle
+import tempfile
+import time
+
+DEFAULT_MAX_BYTES = 256 * 1024 * 1024
+
+
+class PartialCache:
+    """Дисковый кэш частичных результатов отчетов по файлам.
+
+    Ключ записи строится из абсолютного пути, размера и времени изменения
+    файла (при необходимости еще и хэша содержимого), поэтому измененный
+    файл автоматически получает новый ключ. При превышении max_bytes
+    удаляются записи, к которым дольше всего не обращались (LRU).
+    """
+
+    suffix = ".partial"
+
+    def __init__(self, directory, max_bytes=DEFAULT_MAX_BYTES, content_hash=False):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.content_hash = content_hash
+        os.makedirs(directory, exist_ok=True)
+
+    def key(self, file, namespace):
+        """Ключ записи для файла в пространстве имен отчета."""
+        stat = os.stat(file)
+        digest = hashlib.sha256()
+        digest.update(f"{namespace}\0{os.path.abspath(file)}\0{stat.st_size}\0{stat.st_mtime_ns}".encode())
+        if self.content_hash:
+            with open(file, 'rb') as f:
+                for block in iter(lambda: f.read(1024 * 1024), b""):
+                    digest.update(block)
+        return digest.hexdigest()
+
+    def _path(self, key):
+        return os.path.join(self.directory, key + self.suffix)
+
+    def get(self, file, namespace, key=None):
+        """Частичный результат из кэша или None, если файла в кэше нет.
+
+        key — ключ, заранее вычисленный методом key (по умолчанию вычисляется).
+        """
+        path = self._path(self.key(file, namespace) if key is None else key)
+        try:
+            with open(path, 'rb') as f:
+                partial = pickle.load(f)
+        except FileNotFoundError:
+            return None
+        except (pickle.UnpicklingError, EOFError):
+            # Поврежденная запись считается промахом
+            os.unlink(path)
+            return None
+        self._touch(path)
+        return partial
+
+    @staticmethod
+    def _touch(path):
+        """Отметка обращения к записи.
+
+        Время изменения записи служит отметкой последнего обращения для LRU.
+        Время задается явно с точностью до наносекунд, так как системное
+        "текущее время" файловой системы бывает слишком грубым.
+        """
+        now = time.time_ns()
+        os.utime(path, ns=(now, now))
+
+    def put(self, file, namespace, partial, key=None):
+        """Сохранение частичного результата с последующим вытеснением старых записей.
+
+        Ключ следует вычислять до чтения файла и передавать в key: иначе
+        файл, дописанный во время свертки, получит ключ нового размера при
+        устаревшем результате.
+        """
+        path = self._path(self.key(file, namespace) if key is None else key)
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory)
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                pickle.dump(partial, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp_path, path)
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+        self._touch(path)
+        self.evict()
+
+    def entries(self):
+        """Записи кэша от самой давней по обращению к самой свежей."""
+        entries = []
+        with os.scandir(self.directory) as it:
+            for entry in it:
+                if entry.name.endswith(self.suffix):
+                    stat = entry.stat()
+                    entries.append((stat.st_mtime_ns, stat.st_size, entry.path))
+        return sorted(entries)
+
+    def evict(self):
+        """Удаление давно не использованных записей до укладывания в лимит."""
+        entries = self.entries()
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in entries:
+            if total <= self.max_bytes:
+                break
+            os.unlink(path)
+            total -= size
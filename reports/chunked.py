@@ -0,0 +1,147 @@
+"""Чтение больших CSV файлов через mmap по независимым диапазонам байт.
+
+Файл делится на диапазоны целевых смещений, а каждый диапазон сам находит
+свои записи: граница записи — перевод строки вне поля в кавычках, и ее
+начало угадывается без просмотра файла с начала, а при объединении
+проверяется, что начало диапазона совпало с концом предыдущего. Поля в
+кавычках распознаются так же, как их читает csv.reader: кавычка
+открывает поле только в его начале, удвоенная кавычка внутри поля
+экранирована, а кавычка в середине поля без кавычек (O"Brien) и после
+закрывающей кавычки — обычный символ. Поиск идет регулярными
+выражениями без возврата, поэтому файл просматривается один раз без
+цикла по символам. Каждый диапазон разбирается отдельно, поэтому
+диапазоны можно обрабатывать как последовательно, так и в разных
+процессах.
+"""
+import csv
+import io
+import locale
+import mmap
+import os
+import re
+
+# Поле в кавычках от открывающей кавычки в начале поля до одиночной
+# закрывающей кавычки (или конца данных, как у незакрытого поля)
+QUOTED_FIELD = re.compile(rb'(?<![^,\r\n])"[^"]*+(?:""[^"]*+)*+(?:"|\Z)')
+# Данные вне кавычек: текст без кавычек, закрытые поля в кавычках и
+# обычные кавычки не в начале поля. Совпадение обрывается на открывающей
+# кавычке поля, которое не закрыто до конца просматриваемого диапазона
+CLOSED_FIELDS = re.compile(
+    rb'[^"]*+(?:(?:(?<![^,\r\n])"[^"]*+(?:""[^"]*+)*+"|(?<=[^,\r\n])")[^"]*+)*+'
+)
+
+
+def record_end(mm, position, target=None):
+    """Конец записи: позиция после первого перевода строки вне кавычек не раньше target.
+
+    position — начало записи не больше target (по умолчанию target = position).
+    """
+    newline = mm.find(b"\n", position if target is None else target)
+    while newline != -1:
+        opened = CLOSED_FIELDS.match(mm, position, newline).end()
+        if opened == newline:
+            return newline + 1
+        # Перевод строки внутри поля в кавычках: поиск продолжается после поля
+        position = QUOTED_FIELD.match(mm, opened).end()
+        newline = mm.find(b"\n", position)
+    return len(mm)
+
+
+def last_record_end(mm, start, end):
+    """Позиция после последней полной записи в [start, end); start — начало записи."""
+    newline = mm.rfind(b"\n", start, end)
+    while newline != -1:
+        opened = CLOSED_FIELDS.match(mm, start, newline).end()
+        if opened == newline:
+            return newline + 1
+        # Перевод строки внутри поля в кавычках: запись начинается раньше поля
+        newline = mm.rfind(b"\n", start, opened)
+    return start
+
+
+def _iter_lines(mm, start, end, encoding, block_size=1024 * 1024):
+    """Строки диапазона [start, end), начиная с границы записи.
+
+    Диапазон читается блоками, выровненными по переводу строки, и каждый
+    блок декодируется целиком, что намного быстрее построчного чтения.
+    """
+    position = start
+    while position < end:
+        block_end = min(position + block_size, end)
+        if block_end < end:
+            newline = mm.rfind(b"\n", position, block_end)
+            if newline == -1:
+                # Строка длиннее блока: блок продлевается до ее конца
+                newline = mm.find(b"\n", block_end, end)
+            block_end = newline + 1 if newline != -1 else end
+        # newline=None переводит \r\n в \n, как при чтении через open()
+        yield from io.StringIO(mm[position:block_end].decode(encoding), newline=None)
+        position = block_end
+
+
+def split_file(file, parts):
+    """Заголовок файла и до parts диапазонов целевых смещений (start, end).
+
+    Первый диапазон начинается сразу после заголовка, остальные границы —
+    равные доли файла, а не концы записей: записи диапазона находит тот,
+    кто его разбирает (range_bounds), поэтому файл не просматривается
+    заранее одним процессом. Для пустого файла заголовок None.
+    """
+    encoding = locale.getpreferredencoding(False)
+    with open(file, 'rb') as f:
+        size = os.fstat(f.fileno()).st_size
+        if size == 0:
+            return None, []
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            header_end = record_end(mm, 0)
+            header = next(csv.reader(_iter_lines(mm, 0, header_end, encoding)), None)
+
+    step = (size - header_end) / max(parts, 1)
+    boundaries = sorted({header_end + int(step * part) for part in range(max(parts, 1))} | {size})
+    ranges = [(start, end) for start, end in zip(boundaries, boundaries[1:]) if start < end]
+    return header, ranges
+
+
+def range_bounds(file, start, end, exact=False):
+    """Начало и конец записей диапазона целевых смещений [start, end).
+
+    Диапазону принадлежат записи от первой записи, которая начинается не
+    раньше start, до записи, которая содержит смещение end. При exact
+    start — граница записи; иначе начало угадывается так, как будто start
+    не внутри поля в кавычках, поэтому процесс диапазона находит его без
+    просмотра файла с начала. Конец ищется от найденного начала и при
+    верной догадке совпадает с началом следующего диапазона; это
+    проверяется при объединении (join_ranges).
+    """
+    with open(file, 'rb') as f:
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            begin = start if exact else record_end(mm, start)
+            if begin > end:
+                return begin, begin
+            return begin, record_end(mm, begin, end)
+
+
+def join_ranges(ranges, results, redo):
+    """Результаты диапазонов одного файла с проверкой угаданных начал.
+
+    ranges — целевые диапазоны split_file, results — пары ((начало,
+    конец), результат) в том же порядке. Если начало диапазона не совпало
+    с концом предыдущего (целевое смещение пришлось на поле в кавычках),
+    результат отбрасывается, и диапазон разбирается заново функцией
+    redo(start, end) от конца предыдущего; она возвращает такую же пару.
+    Возвращаются проверенные пары.
+    """
+    joined = []
+    for (start, end), (bounds, result) in zip(ranges, results):
+        if joined and bounds[0] != joined[-1][0][1]:
+            bounds, result = redo(joined[-1][0][1], end)
+        joined.append((bounds, result))
+    return joined
+
+
+def iter_range_rows(file, start, end):
+    """Строки csv.reader из диапазона байт [start, end) файла."""
+    encoding = locale.getpreferredencoding(False)
+    with open(file, 'rb') as f:
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            yield from csv.reader(_iter_lines(mm, start, end, encoding))
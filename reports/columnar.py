@@ -0,0 +1,367 @@
+"""Колоночный движок агрегации оценок на NumPy.
+
+Из файла берутся только колонки с именем студента и оценкой, а суммы и
+количества по студентам считаются сгруппированными редукциями
+(np.bincount) по целочисленным кодам имен. Источник колонок зависит от
+файла:
+
+- снимок (.snap): коды имен и оценки int8 читаются массивами без
+  декодирования в строки, словарь имен снимка переводится в общие коды
+  один раз;
+- несжатый CSV в UTF-8: файл разбирается блоками по байтам. Границы
+  строк и полей находятся по позициям переводов строки и запятых,
+  оценки из цифр ASCII переводятся в числа матричным умножением, а имена
+  кодируются одним map по срезам блока. Блоки с кавычками, одиночными \\r
+  или полями длиннее csv.field_size_limit() читаются через csv.reader;
+- остальные файлы (сжатые, в других кодировках): пакеты строк
+  csv.reader, колонки которых выбираются через map(itemgetter).
+
+Неверные строки проверяются построчно так же, как в построчном движке.
+Если NumPy не установлен, отчеты используют обычный построчный путь.
+"""
+from itertools import islice, repeat
+from operator import add, itemgetter
+import codecs
+import csv
+import locale
+import mmap
+
+from . import chunked, snapshot
+from .inputs import is_plain_text, open_text
+from .validation import EMPTY, FORMAT, Validator
+
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover - зависит от окружения
+    np = None
+
+# Пакет небольшой: кортежи колонок живут до конца пакета, и при крупных
+# пакетах время уходит на сборку мусора, а не на разбор
+BATCH_SIZE = 65536
+# Блок несжатого файла, который разбирается по байтам
+BLOCK_SIZE = 8 * 1024 * 1024
+# Более длинные оценки не переводятся в int64 без переполнения
+MAX_DIGITS = 18
+# Суммы с весами np.bincount считаются в float64 и точны до 2**53
+FLOAT_EXACT = 2 ** 53
+# Кодировки, в которых байты запятой, кавычки и перевода строки не
+# встречаются внутри многобайтовых символов
+BYTE_ENCODINGS = ("utf-8", "ascii")
+NEWLINE, CARRIAGE_RETURN, COMMA, ZERO = b"\n"[0], b"\r"[0], b","[0], b"0"[0]
+
+
+def numpy_available():
+    """Проверка, доступен ли NumPy."""
+    return np is not None
+
+
+class _Codes(dict):
+    """Коды имен в порядке первого появления."""
+
+    def __missing__(self, name):
+        code = self[name] = len(self)
+        return code
+
+
+class _ByteCodes(dict):
+    """Коды имен по их байтам; новое имя декодируется и кодируется в names."""
+
+    def __init__(self, names, encoding):
+        super().__init__()
+        self.names = names
+        self.encoding = encoding
+
+    def __missing__(self, raw):
+        code = self[raw] = self.names[raw.decode(self.encoding)]
+        return code
+
+
+class _Totals:
+    """Суммы и количества по кодам студентов общего словаря имен."""
+
+    def __init__(self):
+        self.codes = _Codes()
+        self.sums = np.zeros(0, dtype=np.int64)
+        self.counts = np.zeros(0, dtype=np.int64)
+
+    def encode(self, names, codes=None):
+        """Коды имен одним map по словарю codes (по умолчанию self.codes)."""
+        codes = self.codes if codes is None else codes
+        return np.fromiter(map(codes.__getitem__, names), dtype=np.int64, count=len(names))
+
+    def add(self, codes, values, valid=None):
+        """Добавление оценок values студентов codes (только строк valid, если задано)."""
+        if valid is not None:
+            codes, values = codes[valid], values[valid]
+        size = len(self.codes)
+        if len(values) and int(np.abs(values).max()) * len(values) < FLOAT_EXACT:
+            batch_sums = np.bincount(codes, weights=values, minlength=size).astype(np.int64)
+        else:
+            # Суммы в float64 неточны, поэтому складываются в int64
+            batch_sums = np.zeros(size, dtype=np.int64)
+            np.add.at(batch_sums, codes, values)
+        batch_counts = np.bincount(codes, minlength=size)
+        self.sums = np.pad(self.sums, (0, size - len(self.sums))) + batch_sums
+        self.counts = np.pad(self.counts, (0, size - len(self.counts))) + batch_counts
+
+    def result(self):
+        """Накопители {студент: [сумма, количество]} студентов с верными строками."""
+        sums, counts = self.sums.tolist(), self.counts.tolist()
+        return {
+            student_name: [sums[code], counts[code]]
+            for student_name, code in self.codes.items()
+            if code < len(counts) and counts[code]
+        }
+
+
+def _check_rows(rows, name_of, grade_of, values, valid, name_field, grade_field, validator):
+    """Построчная проверка строк rows с номерами в пакете.
+
+    Как и построчный движок, сообщает валидатору о пустых полях и оценках
+    неверного формата; оценки верных строк записываются в values, а сами
+    строки отмечаются в valid.
+    """
+    for index in rows:
+        name, grade = name_of(index), grade_of(index)
+        row = {name_field: name, grade_field: grade}
+        field = name_field if not name else grade_field if not grade else None
+        if field is not None:
+            validator.reject(EMPTY, field, row, f"Поле {field} в строке {row} не может быть пустым")
+            continue
+        try:
+            values[index] = int(grade)
+        except ValueError as e:
+            validator.reject(FORMAT, grade_field, row, f"Неверный формат данных в строке {row}: {e}")
+            continue
+        valid[index] = True
+
+
+def _fold_strings(totals, names, grades, name_field, grade_field, validator):
+    """Свертка пакета строковых колонок."""
+    validator.rows += len(names)
+    codes = totals.encode(names)
+    if "" not in names and "" not in grades:
+        try:
+            values = np.fromiter(map(int, grades), dtype=np.int64, count=len(grades))
+        except ValueError:
+            pass
+        else:
+            totals.add(codes, values)
+            return
+
+    # Медленный путь только для пакетов с неверными строками
+    values = np.zeros(len(grades), dtype=np.int64)
+    valid = np.zeros(len(grades), dtype=bool)
+    _check_rows(range(len(names)), names.__getitem__, grades.__getitem__, values, valid,
+                name_field, grade_field, validator)
+    totals.add(codes, values, valid)
+
+
+def _fold_rows(totals, rows, name_index, grade_index, batch_size, name_field, grade_field, validator):
+    """Свертка строк csv.reader пакетами по batch_size строк."""
+    # Пустые строки пропускаются, а недостающие поля коротких строк
+    # дополняются пустыми, как в DictReader
+    padding = [""] * (max(name_index, grade_index) + 1)
+    rows = map(add, filter(None, rows), repeat(padding))
+    get_fields = itemgetter(name_index, grade_index)
+    get_name, get_grade = itemgetter(0), itemgetter(1)
+    while pairs := list(map(get_fields, islice(rows, batch_size))):
+        names, grades = list(map(get_name, pairs)), list(map(get_grade, pairs))
+        del pairs
+        _fold_strings(totals, names, grades, name_field, grade_field, validator)
+
+
+def _field_bounds(commas, starts, ends, first, count, index):
+    """Начала и концы поля с номером index в строках [starts, ends).
+
+    first — номер первой запятой строки в commas, count — число запятых
+    строки; отсутствующее в короткой строке поле пустое.
+    """
+    if not len(commas):
+        return (starts if index == 0 else ends), ends
+    last = len(commas) - 1
+    if index == 0:
+        field_starts = starts
+    else:
+        field_starts = np.where(count >= index, commas[np.minimum(first + index - 1, last)] + 1, ends)
+    field_ends = np.where(count > index, commas[np.minimum(first + index, last)], ends)
+    return field_starts, field_ends
+
+
+def _parse_digits(buf, starts, ends):
+    """Оценки из цифр ASCII в int64 и маска строк, которые так разобраны.
+
+    Цифры поля выравниваются по правому краю матрицы, недостающие старшие
+    разряды считаются нулями, а значение — произведение матрицы цифр на
+    степени десяти.
+    """
+    lengths = ends - starts
+    width = min(int(lengths.max()), MAX_DIGITS)
+    columns = np.arange(width)
+    present = columns >= (width - lengths)[:, None]
+    positions = np.where(present, ends[:, None] - width + columns, 0)
+    digits = np.where(present, buf[positions], ZERO).astype(np.int64) - ZERO
+    parsed = ((digits >= 0) & (digits <= 9)).all(axis=1) & (lengths > 0) & (lengths <= MAX_DIGITS)
+    values = digits @ 10 ** np.arange(width - 1, -1, -1, dtype=np.int64)
+    return values, parsed
+
+
+def _fold_block(totals, byte_codes, block, name_index, grade_index, name_field, grade_field, validator):
+    """Свертка блока целых строк без кавычек разбором по байтам.
+
+    Возвращает False, если блок нужно читать через csv.reader: в нем есть
+    одиночный \\r (перевод строки для csv.reader) или строка длиннее
+    csv.field_size_limit().
+    """
+    buf = np.frombuffer(block, dtype=np.uint8)
+    newlines = np.flatnonzero(buf == NEWLINE)
+    starts = np.concatenate(([0], newlines + 1))
+    ends = np.concatenate((newlines, [len(buf)]))
+    carriage_returns = block.count(b"\r")
+    if carriage_returns:
+        # \r перед переводом строки не входит в последнее поле
+        crlf = (ends > starts) & (buf[ends - 1] == CARRIAGE_RETURN)
+        if crlf.sum() != carriage_returns:
+            return False
+        ends = ends - crlf
+    # Пустые строки пропускаются, как в DictReader
+    filled = ends > starts
+    starts, ends = starts[filled], ends[filled]
+    if not len(starts):
+        return True
+    if int((ends - starts).max()) > csv.field_size_limit():
+        return False
+
+    commas = np.flatnonzero(buf == COMMA)
+    first = np.searchsorted(commas, starts)
+    count = np.searchsorted(commas, ends) - first
+    name_starts, name_ends = _field_bounds(commas, starts, ends, first, count, name_index)
+    grade_starts, grade_ends = _field_bounds(commas, starts, ends, first, count, grade_index)
+    values, valid = _parse_digits(buf, grade_starts, grade_ends)
+    valid &= name_ends > name_starts
+
+    validator.rows += len(starts)
+    name_starts, name_ends = name_starts.tolist(), name_ends.tolist()
+    codes = totals.encode(list(map(block.__getitem__, map(slice, name_starts, name_ends))), byte_codes)
+    if not valid.all():
+        grade_starts, grade_ends = grade_starts.tolist(), grade_ends.tolist()
+        encoding = byte_codes.encoding
+        _check_rows(
+            np.flatnonzero(~valid).tolist(),
+            lambda index: block[name_starts[index]:name_ends[index]].decode(encoding),
+            lambda index: block[grade_starts[index]:grade_ends[index]].decode(encoding),
+            values, valid, name_field, grade_field, validator,
+        )
+    totals.add(codes, values, valid)
+    return True
+
+
+def _fold_plain(totals, file, name_field, grade_field, batch_size, block_size, validator, encoding):
+    """Свертка несжатого файла блоками по block_size байт, выровненными по концам записей.
+
+    Возвращает False, если файл нужно читать через csv.reader: переводы
+    строки в нем — одиночные \\r, и концы записей по \\n не находятся.
+    """
+    header, ranges = chunked.split_file(file, 1)
+    if header is None:
+        return True
+    name_index, grade_index = _field_indices(header, file, name_field, grade_field)
+    byte_codes = _ByteCodes(totals.codes, encoding)
+
+    with open(file, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        head = mm[:ranges[0][0] if ranges else len(mm)]
+        if head.count(b"\r") != head.count(b"\r\n"):
+            return False
+        for start, end in ranges:
+            position = start
+            while position < end:
+                block_end = min(position + block_size, end)
+                if block_end < end:
+                    newline = mm.rfind(b"\n", position, block_end)
+                    if newline == -1 or mm.find(b'"', position, newline) != -1:
+                        # Перевод строки может быть внутри поля в кавычках
+                        block_end = chunked.record_end(mm, position, block_end)
+                    else:
+                        block_end = newline + 1
+                block = mm[position:block_end]
+                quoted = b'"' in block
+                if not quoted and not block.isascii():
+                    # Ошибки декодирования те же, что при чтении через csv.reader
+                    block.decode(encoding)
+                if quoted or not _fold_block(totals, byte_codes, block, name_index, grade_index,
+                                             name_field, grade_field, validator):
+                    rows = chunked.iter_range_rows(file, position, block_end)
+                    _fold_rows(totals, rows, name_index, grade_index, batch_size,
+                               name_field, grade_field, validator)
+                position = block_end
+    return True
+
+
+def _fold_snapshot(totals, file, name_field, grade_field, batch_size, validator):
+    """Свертка снимка по кодам колонок без декодирования значений в строки."""
+    with snapshot.open_columns(file, (name_field, grade_field)) as (kinds, dictionaries, groups):
+        if kinds != ["dict", "int8"]:
+            # Колонки других видов декодируются в строки, как при чтении CSV
+            for (name_codes, name_exceptions), (grade_codes, grade_exceptions) in groups:
+                names = snapshot.decode_column(name_codes, kinds[0], name_exceptions, dictionaries[0])
+                grades = snapshot.decode_column(grade_codes, kinds[1], grade_exceptions, dictionaries[1])
+                for batch in range(0, len(names), batch_size):
+                    _fold_strings(totals, names[batch:batch + batch_size], grades[batch:batch + batch_size],
+                                  name_field, grade_field, validator)
+            return
+
+        # Словарь имен снимка переводится в общие коды один раз на файл
+        names = dictionaries[0]
+        codes_by_index = totals.encode(names)
+        sentinel = snapshot.SENTINELS["int8"]
+        empty_name = names.index("") if "" in names else None
+        for (name_codes, _), (grade_codes, exceptions) in groups:
+            name_codes = np.frombuffer(name_codes, dtype=name_codes.typecode)
+            grade_codes = np.frombuffer(grade_codes, dtype=grade_codes.typecode)
+            validator.rows += len(name_codes)
+            values = grade_codes.astype(np.int64)
+            # Пустые, неверные и не помещающиеся в int8 оценки лежат в исключениях
+            valid = grade_codes != sentinel
+            if empty_name is not None:
+                valid &= name_codes != empty_name
+            if not valid.all():
+                _check_rows(
+                    np.flatnonzero(~valid).tolist(),
+                    lambda index: names[name_codes[index]],
+                    lambda index: exceptions[index] if index in exceptions else snapshot.INT8_STRINGS[grade_codes[index]],
+                    values, valid, name_field, grade_field, validator,
+                )
+            totals.add(codes_by_index[name_codes], values, valid)
+
+
+def _field_indices(header, file, name_field, grade_field):
+    """Номера колонок имени и оценки; отсутствие колонки — ошибка всего файла."""
+    for field in (name_field, grade_field):
+        if field not in header:
+            raise ValueError(f"Поле {field} отсутствует в заголовке файла '{file}'")
+    return header.index(name_field), header.index(grade_field)
+
+
+def aggregate_file(file, name_field="student_name", grade_field="grade", batch_size=BATCH_SIZE,
+                   validator=None, block_size=BLOCK_SIZE):
+    """Чтение и свертка файла в накопители {студент: [сумма, количество]}."""
+    if validator is None:
+        validator = Validator()
+    totals = _Totals()
+    encoding = locale.getpreferredencoding(False)
+
+    if snapshot.is_snapshot(file):
+        _fold_snapshot(totals, file, name_field, grade_field, batch_size, validator)
+        return totals.result()
+    if is_plain_text(file) and codecs.lookup(encoding).name in BYTE_ENCODINGS and _fold_plain(
+            totals, file, name_field, grade_field, batch_size, block_size, validator, encoding):
+        return totals.result()
+
+    with open_text(file) as csvfile:
+        reader = csv.reader(csvfile)
+        header = next(reader, None)
+        if header is not None:
+            name_index, grade_index = _field_indices(header, file, name_field, grade_field)
+            _fold_rows(totals, reader, name_index, grade_index, batch_size,
+                       name_field, grade_field, validator)
+    return totals.result()
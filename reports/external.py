@@ -0,0 +1,245 @@
+"""Внешняя агрегация с ограничением памяти для отчетов с большим числом групп.
+
+Строки сворачиваются в обычную таблицу накопителей, пока ее оценочный
+размер не превысит memory_limit. После этого таблица делится по хэшу
+ключа на partitions частей, которые дописываются во временные файлы, и
+свертка продолжается с пустой таблицей. Каждая часть затем объединяется
+отдельно; если и она не помещается в лимит, она делится еще раз с другим
+хэшем (до MAX_DEPTH уровней).
+
+Итоговый порядок отчета строится внешней сортировкой слиянием: строки
+каждой части сортируются и записываются отдельным отрезком, а отрезки
+сливаются потоково (heapq.merge), не более MERGE_FANIN сразу. В памяти
+одновременно находятся таблица одной части и по пакету строк каждого
+отрезка. Если лимит ни разу не превышен, отчет строится как обычно.
+"""
+from collections import deque
+from itertools import count, islice
+import heapq
+import os
+import pickle
+import sys
+import tempfile
+
+from .base_report import SCAN_BATCH_SIZE, BaseReport, check_selection
+from .validation import Validator
+
+DEFAULT_PARTITIONS = 64
+MAX_DEPTH = 8
+MERGE_FANIN = 128
+# Количество строк отрезка, которое пишется и читается за раз
+RUN_BATCH_SIZE = 4096
+# Накладные расходы словаря на одну запись (хэш, ссылки на ключ и значение)
+DICT_ENTRY_BYTES = 64
+SIZE_SAMPLE = 32
+# Номера агрегаторов для имен файлов частей в общем каталоге
+_aggregator_ids = count()
+
+
+def entry_size(report_class, totals):
+    """Оценка размера одной записи таблицы накопителей в байтах по выборке записей.
+
+    Размер накопителя вместе с его слотами (например, корзинами скетча
+    квантилей) оценивает report_class.entry_size.
+    """
+    sample = list(islice(totals.items(), SIZE_SAMPLE))
+    if not sample:
+        return 0
+    size = 0
+    for key, entry in sample:
+        size += sys.getsizeof(key) + report_class.entry_size(entry)
+        if isinstance(key, tuple):
+            size += sum(map(sys.getsizeof, key))
+    return size // len(sample) + DICT_ENTRY_BYTES
+
+
+def _dump_all(path, items, batch_size=RUN_BATCH_SIZE):
+    """Запись элементов в файл пакетами pickle."""
+    with open(path, 'wb') as f:
+        batch = []
+        for item in items:
+            batch.append(item)
+            if len(batch) >= batch_size:
+                pickle.dump(batch, f, protocol=pickle.HIGHEST_PROTOCOL)
+                batch = []
+        if batch:
+            pickle.dump(batch, f, protocol=pickle.HIGHEST_PROTOCOL)
+
+
+def _load_all(path):
+    """Элементы из файла, записанного _dump_all (или частичные результаты части)."""
+    with open(path, 'rb') as f:
+        while True:
+            try:
+                yield from pickle.load(f)
+            except EOFError:
+                return
+
+
+class SpillingAggregator:
+    """Свертка в таблицу накопителей с выгрузкой частей на диск.
+
+    Используется с отчетами, которые поддерживают aggregate с partial,
+    merge_into и entry_size (GroupByReport).
+    """
+
+    def __init__(self, report_class, memory_limit, directory, partitions=DEFAULT_PARTITIONS,
+                 batch_size=SCAN_BATCH_SIZE, depth=0):
+        if memory_limit <= 0:
+            raise ValueError("Лимит памяти должен быть положительным")
+        self.report_class = report_class
+        self.memory_limit = memory_limit
+        self.directory = directory
+        self.partitions = partitions
+        self.batch_size = batch_size
+        self.depth = depth
+        self.totals = {}
+        self.entry_bytes = None
+        self.files = None
+        self.spills = 0
+        self.id = next(_aggregator_ids)
+
+    def add(self, records, validator=None):
+        """Свертка записей пакетами с проверкой размера таблицы после каждого пакета."""
+        validator = Validator() if validator is None else validator
+        records = iter(records)
+        while batch := list(islice(records, self.batch_size)):
+            self.totals = self.report_class.aggregate(batch, self.totals, validator)
+            self._check_memory()
+
+    def add_partial(self, partial):
+        """Добавление готового частичного результата."""
+        self.report_class.merge_into(self.totals, partial)
+        self._check_memory()
+
+    def _check_memory(self):
+        if self.depth >= MAX_DEPTH or len(self.totals) < 2:
+            return
+        # Оценка обновляется при каждой проверке: слоты (скетчи) растут вместе с группой
+        self.entry_bytes = entry_size(self.report_class, self.totals)
+        if len(self.totals) * self.entry_bytes > self.memory_limit:
+            self.spill()
+
+    def spill(self):
+        """Выгрузка таблицы по частям во временные файлы."""
+        if self.files is None:
+            self.files = [
+                os.path.join(self.directory, f"spill-{self.id}-{index}.pkl")
+                for index in range(self.partitions)
+            ]
+        chunks = [{} for _ in range(self.partitions)]
+        depth, partitions = self.depth, self.partitions
+        for key, entry in self.totals.items():
+            # На каждом уровне свой хэш, чтобы часть делилась при повторной выгрузке
+            chunks[hash((depth, key)) % partitions][key] = entry
+        for path, chunk in zip(self.files, chunks):
+            if chunk:
+                with open(path, 'ab') as f:
+                    pickle.dump([chunk], f, protocol=pickle.HIGHEST_PROTOCOL)
+        self.totals = {}
+        self.spills += 1
+
+    def iter_partitions(self):
+        """Итоговые накопители по частям; каждая часть помещается в лимит памяти."""
+        if self.files is None:
+            if self.totals:
+                yield self.totals
+            return
+        self.spill()
+        for path in self.files:
+            if not os.path.exists(path):
+                continue
+            part = SpillingAggregator(self.report_class, self.memory_limit, self.directory,
+                                      self.partitions, self.batch_size, self.depth + 1)
+            for chunk in _load_all(path):
+                part.add_partial(chunk)
+            os.unlink(path)
+            yield from part.iter_partitions()
+
+
+class SpilledReport(BaseReport):
+    """Отчет, строки которого хранятся отсортированными отрезками на диске.
+
+    Строки отдаются потоково в порядке отчета с той же выборкой top,
+    bottom, offset и limit, что и у отчета в памяти.
+    """
+
+    def __init__(self, report_class, runs, tempdir):
+        self.report_class = report_class
+        self.headers = report_class.headers
+        self.runs = runs
+        self._tempdir = tempdir
+
+    @classmethod
+    def from_partitions(cls, report_class, partitions, tempdir):
+        """Сортировка строк каждой части в отрезок и сведение отрезков к MERGE_FANIN."""
+        sort_key = report_class.sort_key()
+        runs = []
+        for partition in partitions:
+            rows = sorted(report_class.from_partial(partition).iter_rows(), key=sort_key)
+            path = os.path.join(tempdir.name, f"run-{len(runs)}.pkl")
+            _dump_all(path, rows)
+            runs.append(path)
+
+        while len(runs) > MERGE_FANIN:
+            merged = []
+            for start in range(0, len(runs), MERGE_FANIN):
+                group = runs[start:start + MERGE_FANIN]
+                path = os.path.join(tempdir.name, f"run-{len(runs)}-{len(merged)}.pkl")
+                _dump_all(path, heapq.merge(*map(_load_all, group), key=sort_key))
+                for run in group:
+                    os.unlink(run)
+                merged.append(path)
+            runs = merged
+        return cls(report_class, runs, tempdir)
+
+    def iter_sorted(self):
+        """Все строки отчета в порядке отчета (слияние отрезков)."""
+        return heapq.merge(*map(_load_all, self.runs), key=self.report_class.sort_key())
+
+    def rows(self, top=None, bottom=None, offset=0, limit=None):
+        """Строки отчета для потоковой записи"""
+        check_selection(top, bottom, offset, limit)
+        rows = self.iter_sorted()
+        if top is not None:
+            rows = islice(rows, top)
+        elif bottom is not None:
+            rows = iter(deque(rows, maxlen=bottom))
+        return islice(rows, offset, offset + limit if limit is not None else None)
+
+    def select(self, top=None, bottom=None, offset=0, limit=None):
+        """Выбор строк отчета в порядке отчета"""
+        return list(self.rows(top, bottom, offset, limit))
+
+    def generate(self, top=None, bottom=None, offset=0, limit=None):
+        """Генерация отчета"""
+        table_data = self.select(top, bottom, offset, limit)
+        if not table_data:
+            raise ValueError("Нет данных для отчета")
+        from tabulate import tabulate
+        return tabulate(table_data, headers=self.headers, tablefmt="grid")
+
+    def close(self):
+        """Удаление временных файлов."""
+        self._tempdir.cleanup()
+
+
+def aggregate_external(report_class, records, memory_limit, spill_dir=None, validator=None,
+                       partitions=DEFAULT_PARTITIONS, batch_size=SCAN_BATCH_SIZE):
+    """Отчет по записям с ограничением памяти на таблицу накопителей.
+
+    Возвращает обычный отчет, если таблица поместилась в memory_limit,
+    иначе SpilledReport, временные файлы которого лежат в spill_dir
+    (по умолчанию — системный каталог временных файлов).
+    """
+    tempdir = tempfile.TemporaryDirectory(prefix="reports-spill-", dir=spill_dir)
+    try:
+        aggregator = SpillingAggregator(report_class, memory_limit, tempdir.name, partitions, batch_size)
+        aggregator.add(records, validator)
+        if aggregator.files is None:
+            tempdir.cleanup()
+            return report_class.from_partial(aggregator.totals)
+        return SpilledReport.from_partitions(report_class, aggregator.iter_partitions(), tempdir)
+    except BaseException:
+        tempdir.cleanup()
+        raise
@@ -0,0 +1,522 @@
+"""Обобщенная группировка с агрегатами для отчетов.
+
+Отчет описывает ключи группировки (group_by), колонку значений (value) и
+список агрегатов (aggregates), а свертка, объединение частичных
+результатов, сортировка и вывод общие. Накопитель группы — список
+[сумма, количество, *доп. слоты]: количество, сумма и среднее считаются
+по первым двум элементам, минимум, максимум и скетч квантилей хранятся в
+дополнительных слотах, только если отчет их запрашивает. Размер
+накопителя не зависит от числа строк группы, а накопители разных файлов,
+диапазонов и процессов объединяются.
+"""
+import heapq
+import math
+import sys
+from datetime import date
+from operator import itemgetter
+
+from .base_report import BaseReport, check_selection, file_errors
+from .validation import EMPTY, FORMAT, Validator
+
+
+class QuantileSketch:
+    """Объединяемый скетч квантилей с относительной точностью (схема DDSketch).
+
+    Значения попадают в корзины с логарифмическими границами, поэтому
+    оценка квантиля отличается от точного значения не более чем на
+    RELATIVE_ACCURACY. Число корзин ограничено MAX_BINS: при переполнении
+    сливаются корзины наименьших по модулю значений.
+    """
+
+    RELATIVE_ACCURACY = 0.01
+    MAX_BINS = 2048
+    # Оценка памяти одной корзины: запись словаря и два целых числа
+    BIN_BYTES = 100
+    GAMMA = (1 + RELATIVE_ACCURACY) / (1 - RELATIVE_ACCURACY)
+    LOG_GAMMA = math.log(GAMMA)
+
+    __slots__ = ("positive", "negative", "zeros", "count")
+
+    def __init__(self):
+        self.positive = {}
+        self.negative = {}
+        self.zeros = 0
+        self.count = 0
+
+    def __eq__(self, other):
+        if not isinstance(other, QuantileSketch):
+            return NotImplemented
+        return (self.positive, self.negative, self.zeros) == (other.positive, other.negative, other.zeros)
+
+    def __getstate__(self):
+        return self.positive, self.negative, self.zeros, self.count
+
+    def __setstate__(self, state):
+        self.positive, self.negative, self.zeros, self.count = state
+
+    @classmethod
+    def _index(cls, value):
+        return math.ceil(math.log(value) / cls.LOG_GAMMA)
+
+    @classmethod
+    def _value(cls, index):
+        return 2 * cls.GAMMA ** index / (cls.GAMMA + 1)
+
+    def add(self, value):
+        """Добавление значения."""
+        self.count += 1
+        if value > 0:
+            bins = self.positive
+            index = self._index(value)
+        elif value < 0:
+            bins = self.negative
+            index = self._index(-value)
+        else:
+            self.zeros += 1
+            return
+        bins[index] = bins.get(index, 0) + 1
+        if len(bins) > self.MAX_BINS:
+            self._collapse(bins)
+
+    def merge(self, other):
+        """Добавление всех значений другого скетча."""
+        for bins, other_bins in ((self.positive, other.positive), (self.negative, other.negative)):
+            for index, count in other_bins.items():
+                bins[index] = bins.get(index, 0) + count
+            if len(bins) > self.MAX_BINS:
+                self._collapse(bins)
+        self.zeros += other.zeros
+        self.count += other.count
+        return self
+
+    def copy(self):
+        sketch = QuantileSketch()
+        sketch.positive = dict(self.positive)
+        sketch.negative = dict(self.negative)
+        sketch.zeros = self.zeros
+        sketch.count = self.count
+        return sketch
+
+    def size(self):
+        """Оценка занимаемой памяти в байтах вместе с корзинами."""
+        return (sys.getsizeof(self) + sys.getsizeof(self.positive) + sys.getsizeof(self.negative)
+                + (len(self.positive) + len(self.negative)) * self.BIN_BYTES)
+
+    def _collapse(self, bins):
+        """Слияние корзин наименьших по модулю значений до MAX_BINS корзин."""
+        indices = sorted(bins)
+        excess = indices[:len(indices) - self.MAX_BINS + 1]
+        bins[excess[-1]] += sum(bins.pop(index) for index in excess[:-1])
+
+    def quantile(self, q):
+        """Оценка квантиля q из [0, 1] или None для пустого скетча."""
+        if not self.count:
+            return None
+        rank = q * (self.count - 1)
+        seen = 0
+        for index in sorted(self.negative, reverse=True):
+            seen += self.negative[index]
+            if seen > rank:
+                return -self._value(index)
+        seen += self.zeros
+        if seen > rank:
+            return 0
+        for index in sorted(self.positive):
+            seen += self.positive[index]
+            if seen > rank:
+                return self._value(index)
+        return self._value(max(self.positive))
+
+
+def _update_min(entry, index, value):
+    if value < entry[index]:
+        entry[index] = value
+
+
+def _update_max(entry, index, value):
+    if value > entry[index]:
+        entry[index] = value
+
+
+def _init_sketch(value):
+    sketch = QuantileSketch()
+    sketch.add(value)
+    return sketch
+
+
+def _update_sketch(entry, index, value):
+    entry[index].add(value)
+
+
+# Дополнительные слоты накопителя:
+# (начальное значение, обновление, объединение, копия, оценка памяти в байтах)
+SLOTS = {
+    "min": (lambda value: value, _update_min, min, lambda state: state, sys.getsizeof),
+    "max": (lambda value: value, _update_max, max, lambda state: state, sys.getsizeof),
+    "sketch": (_init_sketch, _update_sketch, QuantileSketch.merge, QuantileSketch.copy, QuantileSketch.size),
+}
+
+
+class Aggregate:
+    """Агрегат группы; slot — дополнительный слот накопителя, если он нужен."""
+
+    slot = None
+
+    def result(self, entry, slots):
+        """Значение агрегата по накопителю группы (slots — индексы слотов)."""
+        raise NotImplementedError
+
+
+class Count(Aggregate):
+    """Количество значений группы."""
+
+    def result(self, entry, slots):
+        return entry[1]
+
+
+class Sum(Aggregate):
+    """Сумма значений группы."""
+
+    def result(self, entry, slots):
+        return entry[0]
+
+
+class Mean(Aggregate):
+    """Среднее значений группы."""
+
+    def result(self, entry, slots):
+        return entry[0] / entry[1]
+
+
+class Min(Aggregate):
+    """Минимальное значение группы."""
+
+    slot = "min"
+
+    def result(self, entry, slots):
+        return entry[slots["min"]]
+
+
+class Max(Aggregate):
+    """Максимальное значение группы."""
+
+    slot = "max"
+
+    def result(self, entry, slots):
+        return entry[slots["max"]]
+
+
+class Quantile(Aggregate):
+    """Приближенный квантиль q значений группы (QuantileSketch)."""
+
+    slot = "sketch"
+
+    def __init__(self, q):
+        if not 0 <= q <= 1:
+            raise ValueError("Квантиль должен быть в диапазоне [0, 1]")
+        self.q = q
+
+    def result(self, entry, slots):
+        return entry[slots["sketch"]].quantile(self.q)
+
+
+def Median():
+    """Приближенная медиана значений группы."""
+    return Quantile(0.5)
+
+
+class Month:
+    """Ключ группировки: месяц (YYYY-MM) даты вида YYYY-MM-DD из колонки field.
+
+    Значение, которое не разбирается как дата ISO 8601, вызывает ValueError.
+    """
+
+    def __init__(self, field):
+        self.field = field
+
+    def __call__(self, value):
+        parsed = date.fromisoformat(value)
+        return f"{parsed.year:04d}-{parsed.month:02d}"
+
+
+class GroupByReport(BaseReport):
+    """Отчет с группировкой строк по ключам и агрегатами по колонке значений.
+
+    Подкласс задает group_by (имена колонок или ключи вроде Month("date")),
+    value, value_type и aggregates; колонки fields выводятся из них.
+    Строки отчета — значения ключей и агрегатов, порядок — по убыванию
+    агрегата с номером sort_by, при равенстве по ключу.
+    """
+
+    group_by = ()
+    value = "grade"
+    value_type = int
+    aggregates = ()
+    headers = []
+    sort_by = 0
+    # Количество знаков после запятой для дробных значений агрегатов
+    precision = 1
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        sources = [key if isinstance(key, str) else key.field for key in cls.group_by]
+        cls.fields = tuple(dict.fromkeys([*sources, cls.value]))
+        cls.slots = {slot: 2 + index for index, slot in enumerate(
+            dict.fromkeys(aggregate.slot for aggregate in cls.aggregates if aggregate.slot)
+        )}
+
+    def __init__(self, data):
+        self.data = data
+        self.totals = {}
+        self.validate_data()
+
+    def validate_data(self):
+        """Валидация данных.
+
+        Проверка и расчет выполняются за один проход: каждая строка сразу
+        сворачивается в накопители групп, поэтому память зависит от числа
+        групп, а не от числа строк.
+        """
+        if self.data is None:
+            # Данные уже проверены и свернуты в накопители
+            return
+
+        self.totals = self.aggregate(self.project(self.data))
+        self.data = None
+
+    @classmethod
+    def project(cls, rows):
+        """Кортежи колонок fields из строк-словарей с проверкой обязательных полей"""
+        for row in rows:
+            for field in cls.fields:
+                if field not in row:
+                    raise ValueError(f"Поле {field} отсутствует в строке {row}")
+                elif not row[field]:
+                    raise ValueError(f"Поле {field} в строке {row} не может быть пустым")
+            yield tuple(row[field] for field in cls.fields)
+
+    @classmethod
+    def validate_records(cls, records, validator=None):
+        """Проверка, что обязательные поля кортежей колонок fields не пустые.
+
+        Неверные строки передаются валидатору, который по своей политике
+        прерывает проверку или пропускает строку.
+        """
+        if validator is None:
+            validator = Validator()
+        for record in records:
+            validator.rows += 1
+            if not all(record):
+                row = dict(zip(cls.fields, record))
+                field = next(field for field, value in zip(cls.fields, record) if not value)
+                validator.reject(EMPTY, field, row, f"Поле {field} в строке {row} не может быть пустым")
+                continue
+            yield record
+
+    @classmethod
+    def key_function(cls):
+        """Функция ключа группы по кортежу колонок fields.
+
+        Для одного ключа ключ группы — само значение, для нескольких — кортеж.
+        """
+        keys = [
+            (cls.fields.index(key), None) if isinstance(key, str)
+            else (cls.fields.index(key.field), key)
+            for key in cls.group_by
+        ]
+        if len(keys) == 1:
+            index, extract = keys[0]
+            if extract is None:
+                return itemgetter(index)
+            return lambda record: extract(record[index])
+        return lambda record: tuple(
+            record[index] if extract is None else extract(record[index]) for index, extract in keys
+        )
+
+    @classmethod
+    def failed_key_field(cls, record):
+        """Колонка первого вычисляемого ключа, который не разбирает значение записи."""
+        for key in cls.group_by:
+            if isinstance(key, str):
+                continue
+            try:
+                key(record[cls.fields.index(key.field)])
+            except ValueError:
+                return key.field
+
+    @classmethod
+    def aggregate(cls, records, partial=None, validator=None):
+        """Свертка кортежей колонок fields в накопители {ключ: [сумма, количество, *слоты]}.
+
+        Строки с неверным значением или ключом (например, датой для
+        Month) передаются валидатору как ошибки формата.
+        """
+        if validator is None:
+            validator = Validator()
+        totals = {} if partial is None else partial
+        key_of = cls.key_function()
+        value_index = cls.fields.index(cls.value)
+        parse = cls.value_type
+        inits = [SLOTS[slot][0] for slot in cls.slots]
+        updates = [(index, SLOTS[slot][1]) for slot, index in cls.slots.items()]
+
+        for record in cls.validate_records(records, validator):
+            try:
+                value = parse(record[value_index])
+            except ValueError as e:
+                row = dict(zip(cls.fields, record))
+                validator.reject(FORMAT, cls.value, row, f"Неверный формат данных в строке {row}: {e}")
+                continue
+
+            try:
+                key = key_of(record)
+            except ValueError as e:
+                row = dict(zip(cls.fields, record))
+                field = cls.failed_key_field(record)
+                validator.reject(FORMAT, field, row, f"Неверный формат данных в строке {row}: {e}")
+                continue
+
+            entry = totals.get(key)
+            if entry is None:
+                totals[key] = [value, 1, *[init(value) for init in inits]] if inits else [value, 1]
+            else:
+                entry[0] += value
+                entry[1] += 1
+                for index, update in updates:
+                    update(entry, index, value)
+        return totals
+
+    @classmethod
+    def numpy_supported(cls):
+        """Колоночный движок считает только суммы и количества по одной колонке-ключу."""
+        return (len(cls.group_by) == 1 and isinstance(cls.group_by[0], str)
+                and not cls.slots and cls.value_type is int)
+
+    @classmethod
+    def aggregate_file(cls, file, engine="python", validator=None):
+        """Свертка файла выбранным движком.
+
+        Движок "numpy" читает только нужные колонки (из снимка — коды
+        колонок без декодирования) и считает суммы сгруппированными
+        редукциями; если NumPy нет или отчету нужны дополнительные слоты,
+        используется построчный путь.
+        """
+        if engine == "numpy" and cls.numpy_supported():
+            # NumPy импортируется только при выборе колоночного движка
+            from . import columnar
+            if columnar.numpy_available():
+                with file_errors(file):
+                    return columnar.aggregate_file(file, *cls.fields, validator=validator)
+        return super().aggregate_file(file, engine, validator)
+
+    @classmethod
+    def merge_partials(cls, partials):
+        """Объединение накопителей, полученных из разных файлов"""
+        totals = {}
+        for partial in partials:
+            cls.merge_into(totals, partial)
+        return totals
+
+    @classmethod
+    def merge_into(cls, totals, partial):
+        """Добавление накопителей partial к totals на месте; возвращает totals"""
+        slots = [(index, SLOTS[slot][2], SLOTS[slot][3]) for slot, index in cls.slots.items()]
+        for key, other in partial.items():
+            entry = totals.get(key)
+            if entry is None:
+                # Копия, чтобы не изменять накопители исходных частичных результатов
+                entry = totals[key] = list(other)
+                for index, _, copy in slots:
+                    entry[index] = copy(entry[index])
+            else:
+                entry[0] += other[0]
+                entry[1] += other[1]
+                for index, merge, _ in slots:
+                    entry[index] = merge(entry[index], other[index])
+        return totals
+
+    @classmethod
+    def entry_size(cls, entry):
+        """Оценка памяти накопителя группы в байтах вместе с состоянием слотов"""
+        size = sys.getsizeof(entry) + sys.getsizeof(entry[0]) + sys.getsizeof(entry[1])
+        for slot, index in cls.slots.items():
+            size += SLOTS[slot][4](entry[index])
+        return size
+
+    @classmethod
+    def from_partial(cls, partial):
+        """Создание отчета из готовых накопителей"""
+        report = cls(())
+        report.totals = partial
+        return report
+
+    @classmethod
+    def sort_key(cls):
+        """Ключ порядка отчета: по убыванию агрегата sort_by, при равенстве по ключу"""
+        size = len(cls.group_by)
+        index = size + cls.sort_by
+        if size == 1:
+            return lambda row: (-row[index], row[0])
+        return lambda row: (-row[index], row[:size])
+
+    def iter_rows(self):
+        """Строки (ключи..., агрегаты...) в порядке накопителей"""
+        aggregates, slots, precision = self.aggregates, self.slots, self.precision
+        if len(self.group_by) == 1 and len(aggregates) == 1:
+            # Частый случай одного ключа и одного агрегата без промежуточных списков
+            result = aggregates[0].result
+            for key, entry in self.totals.items():
+                value = result(entry, slots)
+                yield key, round(value, precision) if isinstance(value, float) else value
+            return
+
+        single_key = len(self.group_by) == 1
+        for key, entry in self.totals.items():
+            values = []
+            for aggregate in aggregates:
+                value = aggregate.result(entry, slots)
+                values.append(round(value, precision) if isinstance(value, float) else value)
+            yield ((key,) if single_key else key) + tuple(values)
+
+    def select(self, top=None, bottom=None, offset=0, limit=None):
+        """Выбор строк отчета в порядке отчета.
+
+        top/bottom выбирают первые или последние N строк отчета, а
+        offset/limit — страницу внутри выборки. Для выборки используется
+        куча ограниченного размера, поэтому полная сортировка выполняется
+        только когда нужны все строки.
+        """
+        check_selection(top, bottom, offset, limit)
+
+        rows = self.iter_rows()
+        sort_key = self.sort_key()
+
+        if bottom is not None:
+            selected = heapq.nlargest(bottom, rows, key=sort_key)
+            selected.reverse()
+        else:
+            size = top
+            if limit is not None:
+                size = offset + limit if size is None else min(size, offset + limit)
+            if size is None:
+                selected = sorted(rows, key=sort_key)
+            else:
+                selected = heapq.nsmallest(size, rows, key=sort_key)
+
+        stop = offset + limit if limit is not None else None
+        return selected[offset:stop]
+
+    def rows(self, top=None, bottom=None, offset=0, limit=None):
+        """Строки отчета для потоковой записи"""
+        return self.select(top, bottom, offset, limit)
+
+    def generate(self, top=None, bottom=None, offset=0, limit=None):
+        """Генерация отчета"""
+
+        table_data = self.select(top, bottom, offset, limit)
+
+        if not table_data:
+            raise ValueError("Нет данных для отчета")
+
+        from tabulate import tabulate
+        return tabulate(table_data, headers=self.headers, tablefmt="grid")
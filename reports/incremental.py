@@ -0,0 +1,134 @@
+import csv
+import hashlib
+import locale
+import mmap
+import os
+import pickle
+import tempfile
+
+from .base_report import project_records
+from .chunked import last_record_end
+from .inputs import is_plain_text
+from .validation import Validator
+
+PREFIX_BYTES = 64 * 1024
+
+
+class IncrementalState:
+    """Состояние инкрементальной агрегации растущих CSV файлов.
+
+    Для каждого файла запоминаются смещение после последней полностью
+    прочитанной строки, заголовок, контрольная сумма начала файла,
+    частичный результат отчета и счетчики валидатора; записи разных
+    политик валидации хранятся отдельно. При следующем запуске разбирается
+    только дописанный хвост. Если файл стал короче или его начало изменилось,
+    файл считается перезаписанным и разбирается целиком.
+
+    Файлы должны дописываться целыми записями: незавершенная последняя
+    запись (без перевода строки или с незакрытым полем в кавычках)
+    откладывается до следующего запуска.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.entries = {}
+        if os.path.exists(path):
+            with open(path, 'rb') as f:
+                self.entries = pickle.load(f)
+
+    def save(self):
+        """Атомарное сохранение состояния на диск."""
+        directory = os.path.dirname(os.path.abspath(self.path))
+        fd, tmp_path = tempfile.mkstemp(dir=directory)
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                pickle.dump(self.entries, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp_path, self.path)
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+
+    @staticmethod
+    def _prefix_hash(f, length):
+        f.seek(0)
+        return hashlib.sha256(f.read(length)).hexdigest()
+
+    @staticmethod
+    def _last_record_end(f, start, size):
+        """Позиция после последней полной записи в диапазоне [start, size).
+
+        Перевод строки внутри поля в кавычках не завершает запись, поэтому
+        поле, дописанное частями, разбирается целиком при следующем запуске.
+        """
+        if size <= start:
+            return start
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            return last_record_end(mm, start, size)
+
+    @staticmethod
+    def _read_lines(f, start, end):
+        """Построчное чтение диапазона [start, end) с декодированием каждой строки."""
+        encoding = locale.getpreferredencoding(False)
+        f.seek(start)
+        remaining = end - start
+        while remaining > 0:
+            line = f.readline(remaining)
+            remaining -= len(line)
+            yield line.decode(encoding)
+
+    def aggregate_file(self, report_class, file, validator=None):
+        """Частичный результат по файлу с разбором только новых строк.
+
+        Новые строки проверяются отдельным валидатором файла, к которому
+        сначала добавляются сохраненные счетчики прежних строк, поэтому лимит
+        и доля ошибок относятся ко всему файлу; затем он добавляется к
+        validator (Validator).
+        """
+        if not is_plain_text(file):
+            raise ValueError(f"Инкрементальный режим поддерживает только несжатые CSV файлы: '{file}'")
+        validator = Validator() if validator is None else validator
+        # Частичный результат зависит от политики, поэтому записи политик не смешиваются
+        key = (f"{report_class.__module__}.{report_class.__qualname__}", os.path.abspath(file),
+               validator.policy)
+        entry = self.entries.get(key)
+
+        with open(file, 'rb') as f:
+            size = os.fstat(f.fileno()).st_size
+            if entry is not None and (
+                size < entry["offset"]
+                or self._prefix_hash(f, entry["prefix_length"]) != entry["prefix_hash"]
+            ):
+                # Файл усечен или перезаписан: полный разбор
+                entry = None
+
+            file_validator = validator.spawn()
+            if entry is not None:
+                file_validator.merge(entry["validator"])
+            offset = entry["offset"] if entry is not None else 0
+            end = self._last_record_end(f, offset, size)
+            lines = self._read_lines(f, offset, end)
+
+            # При полном разборе заголовок читается из файла, иначе берется сохраненный
+            reader = csv.reader(lines)
+            header = entry["header"] if entry is not None else None
+            if header is None:
+                header = next(reader, None)
+            records = project_records(reader, report_class.fields, file, header) if header else ()
+            partial = report_class.aggregate(records, validator=file_validator)
+            if entry is not None:
+                partial = report_class.merge_partials([entry["partial"], partial])
+
+            offset = end
+            prefix_length = min(offset, PREFIX_BYTES)
+            prefix_hash = self._prefix_hash(f, prefix_length)
+
+        self.entries[key] = {
+            "offset": offset,
+            "header": header,
+            "prefix_length": prefix_length,
+            "prefix_hash": prefix_hash,
+            "partial": partial,
+            "validator": file_validator,
+        }
+        validator.merge(file_validator)
+        return partial
@@ -0,0 +1,113 @@
+"""Входные файлы отчетов: каталоги, шаблоны и сжатые файлы.
+
+Пути раскрываются лениво: каталоги обходятся рекурсивно (в каждом
+каталоге — в порядке имен), шаблоны glob раскрываются по мере обхода.
+Сжатые файлы (gzip, bz2, xz и zstd при наличии модуля) распаковываются
+потоково прямо в разбор CSV, без временных файлов. Снимки (.snap) при
+обходе каталогов пропускаются и читаются, только если указаны путем к
+файлу или шаблоном glob. Модули распаковки импортируются только при
+открытии сжатого файла.
+"""
+from functools import cache
+import csv
+import glob
+import importlib
+import os
+
+from .snapshot import SUFFIX as SNAPSHOT_SUFFIX
+
+
+@cache
+def zstd_module():
+    """Модуль zstd (compression.zstd или zstandard) или None."""
+    try:
+        return importlib.import_module("compression.zstd")
+    except ImportError:
+        try:
+            return importlib.import_module("zstandard")
+        except ImportError:  # pragma: no cover - зависит от окружения
+            return None
+
+
+def _opener(module):
+    return lambda file: importlib.import_module(module).open(file, 'rt')
+
+
+def _open_zstd(file):
+    zstd = zstd_module()
+    if zstd is None:
+        raise ValueError(f"Для чтения файла '{file}' нужен модуль zstandard")
+    return zstd.open(file, 'rt')
+
+
+OPENERS = {
+    ".gz": _opener("gzip"),
+    ".bz2": _opener("bz2"),
+    ".xz": _opener("lzma"),
+    ".zst": _open_zstd,
+}
+# Файлы, которые берутся при обходе каталогов. Снимки не берутся: они обычно
+# лежат рядом с CSV файлами, из которых построены, и строки учитывались бы
+# дважды; снимок указывается путем к файлу или шаблоном glob
+CSV_SUFFIXES = (".csv", *(".csv" + suffix for suffix in OPENERS))
+
+
+def is_compressed(file):
+    """Проверка, что файл сжат (по расширению)."""
+    return os.path.splitext(file)[1] in OPENERS
+
+
+def is_plain_text(file):
+    """Проверка, что файл — несжатый CSV (его можно читать по смещениям)."""
+    return not is_compressed(file) and not file.endswith(SNAPSHOT_SUFFIX)
+
+
+def open_text(file):
+    """Открытие CSV файла на чтение текста с потоковой распаковкой по расширению."""
+    opener = OPENERS.get(os.path.splitext(file)[1])
+    if opener is None:
+        return open(file, 'r')
+    return opener(file)
+
+
+def read_header(file):
+    """Заголовок CSV файла."""
+    with open_text(file) as f:
+        header = next(csv.reader(f), None)
+    if header is None:
+        raise ValueError(f"Файл '{file}' пуст")
+    return header
+
+
+def _walk(directory):
+    """CSV файлы каталога и его подкаталогов в порядке имен."""
+    with os.scandir(directory) as entries:
+        entries = sorted(entries, key=lambda entry: entry.name)
+    for entry in entries:
+        if entry.is_dir():
+            yield from _walk(entry.path)
+        elif entry.name.endswith(CSV_SUFFIXES):
+            yield entry.path
+
+
+def expand_paths(paths):
+    """Ленивое раскрытие каталогов и шаблонов glob в пути к файлам.
+
+    Существующий путь к файлу и путь без символов шаблона отдаются как
+    есть, поэтому ошибка отсутствующего файла возникает при его чтении.
+    """
+    for path in paths:
+        if os.path.isdir(path):
+            yield from _walk(path)
+        elif glob.has_magic(path) and not os.path.exists(path):
+            found = False
+            for file in glob.iglob(path, recursive=True):
+                if os.path.isdir(file):
+                    yield from _walk(file)
+                else:
+                    yield file
+                found = True
+            if not found:
+                raise FileNotFoundError(f"Файлы по шаблону '{path}' не найдены.")
+        else:
+            yield path
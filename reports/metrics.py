@@ -0,0 +1,109 @@
+import cProfile
+import json
+import os
+import time
+from contextlib import contextmanager
+
+try:
+    import resource
+except ImportError:  # pragma: no cover - нет на Windows
+    resource = None
+
+
+def peak_rss():
+    """Пиковый размер резидентной памяти процесса в байтах или None."""
+    if resource is None:
+        return None
+    # В Linux ru_maxrss измеряется в килобайтах, в macOS — в байтах
+    scale = 1 if os.uname().sysname == "Darwin" else 1024
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * scale
+
+
+def cpu_time():
+    """Процессорное время процесса вместе с завершившимися дочерними процессами."""
+    times = os.times()
+    return times.user + times.system + times.children_user + times.children_system
+
+
+class Metrics:
+    """Сбор метрик по стадиям построения отчета.
+
+    Каждая стадия (и, где возможно, каждый входной файл) записывается как
+    словарь с временем, процессорным временем, количеством строк, строками
+    в секунду, прочитанными байтами и пиковой памятью процесса. Функции из
+    hooks вызываются с каждой завершенной записью. Если задан profile_stage,
+    стадии с этим именем выполняются под cProfile, и статистику можно
+    сохранить через dump_profile.
+
+    Чтение, разбор и свертка строк выполняются потоково в одном проходе,
+    поэтому измеряются одной стадией "aggregate"; разбивку внутри нее
+    показывает профиль.
+    """
+
+    def __init__(self, hooks=(), profile_stage=None):
+        self.records = []
+        self.hooks = list(hooks)
+        self.profile_stage = profile_stage
+        self.profiler = cProfile.Profile() if profile_stage else None
+
+    def add_hook(self, hook):
+        """Добавление функции, вызываемой с каждой завершенной записью."""
+        self.hooks.append(hook)
+
+    @contextmanager
+    def stage(self, name, file=None):
+        """Замер стадии; в полученную запись можно добавить rows и bytes."""
+        record = {"stage": name, "file": file, "rows": None, "bytes": None}
+        profiled = self.profiler is not None and name == self.profile_stage
+        started, cpu_started = time.perf_counter(), cpu_time()
+        if profiled:
+            self.profiler.enable()
+        try:
+            yield record
+        finally:
+            if profiled:
+                self.profiler.disable()
+            wall = time.perf_counter() - started
+            record["wall_seconds"] = wall
+            record["cpu_seconds"] = cpu_time() - cpu_started
+            record["rows_per_sec"] = record["rows"] / wall if record["rows"] and wall else None
+            record["peak_rss_bytes"] = peak_rss()
+            self.records.append(record)
+            for hook in self.hooks:
+                hook(record)
+
+    @staticmethod
+    def counted(record, records):
+        """Пропуск записей итератора с подсчетом их количества в record["rows"]."""
+        record["rows"] = record["rows"] or 0
+        for item in records:
+            record["rows"] += 1
+            yield item
+
+    def summary(self):
+        """Записи по стадиям и файлам и итоги по каждой стадии."""
+        totals = {}
+        for record in self.records:
+            total = totals.setdefault(record["stage"], {
+                "wall_seconds": 0.0, "cpu_seconds": 0.0, "rows": None, "bytes": None,
+            })
+            total["wall_seconds"] += record["wall_seconds"]
+            total["cpu_seconds"] += record["cpu_seconds"]
+            for field in ("rows", "bytes"):
+                if record[field] is not None:
+                    total[field] = (total[field] or 0) + record[field]
+        for total in totals.values():
+            rows, wall = total["rows"], total["wall_seconds"]
+            total["rows_per_sec"] = rows / wall if rows and wall else None
+        return {"stages": totals, "records": self.records, "peak_rss_bytes": peak_rss()}
+
+    def dump(self, stream):
+        """Запись сводки в поток в формате JSON."""
+        json.dump(self.summary(), stream, ensure_ascii=False, indent=2)
+        stream.write("\n")
+
+    def dump_profile(self, path):
+        """Сохранение статистики cProfile профилируемой стадии (формат pstats)."""
+        if self.profiler is None:
+            raise ValueError("Профилирование стадии не включено")
+        self.profiler.dump_stats(path)
@@ -0,0 +1,9 @@
+from .groupby import Count, GroupByReport, Mean, Month
+
+
+class MonthlyPerformanceReport(GroupByReport):
+    """Отчет о среднем балле по месяцам"""
+
+    group_by = (Month("date"),)
+    aggregates = (Mean(), Count())
+    headers = ["Month", "Average Grade", "Grades"]
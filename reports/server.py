@@ -0,0 +1,277 @@
+"""Постоянно работающий сервер отчетов с горячим обновлением файлов.
+
+Процесс один раз импортирует модули и сворачивает файлы, а затем хранит в
+памяти частичные результаты всех отчетов по каждому файлу (ReportStore).
+Фоновый поток опрашивает время изменения и размер файлов и заново
+сворачивает только новые и измененные файлы; удаленные файлы исключаются,
+а явно указанные, но отсутствующие файлы перечисляются в /status.
+Готовые ответы запоминаются до следующего изменения файлов, поэтому
+повторный запрос отдается без агрегации и сортировки.
+
+Запросы принимаются по HTTP на TCP порту или Unix сокете:
+    GET /reports                    — названия отчетов (JSON)
+    GET /status                     — состояние хранилища (JSON)
+    GET /report/<название>?format=jsonl&top=10&offset=0&limit=5
+"""
+from collections import OrderedDict
+from http import HTTPStatus
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+import io
+import json
+import os
+import socket
+import socketserver
+import stat
+import sys
+import threading
+import time
+
+from . import inputs
+from .base_report import ReportFactory, check_selection, file_errors
+from .validation import Validator
+from .writers import WRITERS
+
+DEFAULT_INTERVAL = 1.0
+# Количество запомненных ответов; сбрасываются при изменении файлов
+RESPONSE_CACHE_SIZE = 256
+SELECTION = ("top", "bottom", "offset", "limit")
+CONTENT_TYPES = {
+    "grid": "text/plain; charset=utf-8",
+    "csv": "text/csv; charset=utf-8",
+    "tsv": "text/tab-separated-values; charset=utf-8",
+    "jsonl": "application/x-ndjson; charset=utf-8",
+}
+
+
+class ReportStore:
+    """Частичные результаты отчетов по файлам с обновлением измененных файлов.
+
+    Файл считается измененным, если изменились его размер или время
+    изменения. Отчеты собираются из частичных результатов при первом
+    запросе и запоминаются до следующего изменения.
+    """
+
+    def __init__(self, report_names, paths, workers=1, reader="csv", validator=None):
+        self.report_names = list(report_names)
+        self.report_classes = [ReportFactory.report_class(report_name) for report_name in self.report_names]
+        self.paths = list(paths)
+        self.workers = workers
+        self.reader = reader
+        self.validator = Validator() if validator is None else validator
+        # {файл: ((размер, mtime_ns), [частичный результат каждого отчета])}
+        self.entries = {}
+        # Счетчики валидатора последнего обновления
+        self.validation = None
+        # Явно указанные файлы, которых не было при последнем опросе
+        self.missing = []
+        self.reports = {}
+        self.responses = OrderedDict()
+        self.refreshes = 0
+        self.refreshed_at = None
+        self.error = None
+        self.lock = threading.Lock()
+
+    def refresh(self):
+        """Свертка новых и измененных файлов; возвращает измененные и удаленные файлы."""
+        files = list(dict.fromkeys(inputs.expand_paths(self.paths)))
+        stats = {}
+        missing = []
+        for file in files:
+            try:
+                with file_errors(file):
+                    file_stat = os.stat(file)
+            except FileNotFoundError:
+                # Удаленный файл, указанный явно, исключается, а остальные
+                # файлы обновляются как обычно
+                missing.append(file)
+                continue
+            stats[file] = (file_stat.st_size, file_stat.st_mtime_ns)
+        files = [file for file in files if file in stats]
+        with self.lock:
+            self.missing = missing
+
+        entries = self.entries
+        changed = [file for file in files if file not in entries or entries[file][0] != stats[file]]
+        removed = [file for file in entries if file not in stats]
+        if not changed and not removed:
+            return []
+
+        validator = self.validator.spawn()
+        partials = ReportFactory.scan_partials(self.report_classes, changed, self.workers,
+                                               reader=self.reader, validator=validator)
+        validator.check_budget(final=True)
+        computed = dict(zip(changed, partials))
+        entries = {
+            file: (stats[file], computed[file]) if file in computed else entries[file]
+            for file in files
+        }
+        with self.lock:
+            self.entries = entries
+            self.reports = {}
+            self.responses.clear()
+            self.refreshes += 1
+            self.refreshed_at = time.time()
+            self.validation = validator.summary()
+            self.error = None
+        return changed + removed
+
+    def report(self, report_name):
+        """Отчет по текущим частичным результатам."""
+        if report_name not in self.report_names:
+            raise KeyError(report_name)
+        with self.lock:
+            report = self.reports.get(report_name)
+            if report is None:
+                position = self.report_names.index(report_name)
+                report_class = self.report_classes[position]
+                report = report_class.from_partial(report_class.merge_partials(
+                    [partials[position] for _, partials in self.entries.values()]
+                ))
+                self.reports[report_name] = report
+            return report
+
+    def render(self, report_name, output_format="grid", **selection):
+        """Текст отчета в формате output_format; повторные запросы берутся из памяти."""
+        key = (report_name, output_format, *(selection.get(name) for name in SELECTION))
+        with self.lock:
+            body = self.responses.get(key)
+            if body is not None:
+                self.responses.move_to_end(key)
+                return body
+            generation = self.refreshes
+
+        stream = io.StringIO()
+        self.report(report_name).write(stream, output_format, **selection)
+        body = stream.getvalue()
+        with self.lock:
+            # Ответ, построенный до обновления файлов, не запоминается
+            if generation == self.refreshes:
+                self.responses[key] = body
+                if len(self.responses) > RESPONSE_CACHE_SIZE:
+                    self.responses.popitem(last=False)
+        return body
+
+    def status(self):
+        """Состояние хранилища для /status."""
+        with self.lock:
+            return {
+                "reports": self.report_names,
+                "files": len(self.entries),
+                "refreshes": self.refreshes,
+                "refreshed_at": self.refreshed_at,
+                "validation": self.validation,
+                "missing": self.missing,
+                "error": self.error,
+            }
+
+    def watch(self, interval=DEFAULT_INTERVAL, stop=None):
+        """Опрос файлов каждые interval секунд до установки события stop.
+
+        Ошибка обновления (например, файл удален во время чтения или
+        превышен лимит неверных строк) не останавливает сервер: запросы
+        обслуживаются по прежним данным, а ошибка видна в /status.
+        """
+        stop = threading.Event() if stop is None else stop
+        while not stop.wait(interval):
+            try:
+                self.refresh()
+            except Exception as e:
+                with self.lock:
+                    self.error = str(e)
+                print(f"Ошибка обновления файлов: {e}", file=sys.stderr)
+
+
+class ReportRequestHandler(BaseHTTPRequestHandler):
+    """Обработчик запросов к ReportStore (self.server.store)."""
+
+    protocol_version = "HTTP/1.1"
+    quiet = True
+
+    def setup(self):
+        # Заголовки и тело отправляются отдельно; без TCP_NODELAY ответ на
+        # keep-alive соединении ждет подтверждения клиента (около 40 мс)
+        self.disable_nagle_algorithm = self.request.family != socket.AF_UNIX
+        super().setup()
+
+    def do_GET(self):
+        url = urlsplit(self.path)
+        parts = [part for part in url.path.split("/") if part]
+        store = self.server.store
+        try:
+            if parts == ["reports"]:
+                return self.send(HTTPStatus.OK, json.dumps(store.report_names), "application/json")
+            if parts == ["status"]:
+                return self.send(HTTPStatus.OK, json.dumps(store.status()), "application/json")
+            if len(parts) == 2 and parts[0] == "report":
+                query = {name: values[-1] for name, values in parse_qs(url.query).items()}
+                output_format = query.pop("format", "grid")
+                if output_format not in WRITERS:
+                    raise ValueError(f"Формат '{output_format}' не поддерживается.")
+                selection = {name: int(query[name]) for name in SELECTION if name in query}
+                check_selection(**selection)
+                body = store.render(parts[1], output_format, **selection)
+                return self.send(HTTPStatus.OK, body, CONTENT_TYPES[output_format])
+            self.send(HTTPStatus.NOT_FOUND, f"Неизвестный путь '{url.path}'\n")
+        except KeyError as e:
+            self.send(HTTPStatus.NOT_FOUND, f"Отчет '{e.args[0]}' не найден.\n")
+        except ValueError as e:
+            self.send(HTTPStatus.BAD_REQUEST, f"Error: {e}\n")
+
+    def send(self, status, body, content_type="text/plain; charset=utf-8"):
+        data = body.encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def address_string(self):
+        # У клиентов Unix сокета нет адреса
+        return self.client_address[0] if self.client_address else "unix"
+
+    def log_message(self, format, *args):
+        if not self.quiet:
+            super().log_message(format, *args)
+
+
+class UnixHTTPServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    """HTTP сервер на Unix сокете."""
+
+    daemon_threads = True
+
+
+def make_server(store, host="127.0.0.1", port=8000, socket_path=None):
+    """HTTP сервер для store на TCP порту или Unix сокете (socket_path)."""
+    if socket_path is not None:
+        # Удаляется только оставшийся от прошлого запуска сокет, а не файл по ошибочному пути
+        try:
+            mode = os.lstat(socket_path).st_mode
+        except FileNotFoundError:
+            pass
+        else:
+            if not stat.S_ISSOCK(mode):
+                raise ValueError(f"Путь '{socket_path}' существует и не является сокетом.")
+            os.unlink(socket_path)
+        server = UnixHTTPServer(socket_path, ReportRequestHandler)
+    else:
+        server = ThreadingHTTPServer((host, port), ReportRequestHandler)
+        server.daemon_threads = True
+    server.store = store
+    return server
+
+
+def serve(store, host="127.0.0.1", port=8000, socket_path=None, interval=DEFAULT_INTERVAL):
+    """Первичная свертка, запуск опроса файлов и обработка запросов до остановки."""
+    store.refresh()
+    stop = threading.Event()
+    watcher = threading.Thread(target=store.watch, args=(interval, stop), daemon=True)
+    watcher.start()
+    server = make_server(store, host, port, socket_path)
+    try:
+        server.serve_forever()
+    finally:
+        stop.set()
+        server.server_close()
+        if socket_path is not None and os.path.exists(socket_path):
+            os.unlink(socket_path)
@@ -0,0 +1,244 @@
+"""Двоичный колоночный снимок CSV данных для повторных отчетов.
+
+Снимок хранит строки группами (row groups), внутри группы — по колонкам:
+строковые колонки кодируются словарем (коды uint32, словарь колонки
+общий на весь файл), даты — порядковым номером дня (int32), оценки —
+int8. Значения, которые нельзя закодировать без потерь (пустые, с
+неверным форматом, вне диапазона), записываются в таблицу исключений
+группы как строки, поэтому отчеты по снимку получают ровно те же
+значения, что и при чтении CSV.
+
+Структура файла: MAGIC, данные колонок, JSON footer с описанием колонок,
+словарями и смещениями групп, длина footer (uint64 LE) и снова MAGIC.
+Файл читается через mmap, декодируются только нужные отчету колонки;
+колоночный движок берет коды колонок без декодирования (open_columns).
+"""
+from array import array
+from contextlib import contextmanager
+from datetime import date
+import json
+import mmap
+import os
+import struct
+import sys
+
+MAGIC = b"RPTSNAP1"
+SUFFIX = ".snap"
+ROW_GROUP_SIZE = 64 * 1024
+TRAILER = struct.Struct("<Q")
+
+# Тип колонки по имени; остальные колонки кодируются словарем
+COLUMN_KINDS = {"grade": "int8", "date": "date"}
+TYPECODES = {"dict": "I", "int8": "b", "date": "i"}
+# Код, означающий "значение в таблице исключений"
+SENTINELS = {"dict": None, "int8": -128, "date": 0}
+# Строки оценок по коду int8: отрицательные коды индексируют список с конца
+INT8_STRINGS = [str(value) for value in range(128)] + [str(value) for value in range(-128, 0)]
+
+
+def is_snapshot(file):
+    """Проверка, что файл — снимок (по расширению)."""
+    return file.endswith(SUFFIX)
+
+
+def _encode_int8(value):
+    try:
+        number = int(value)
+    except ValueError:
+        return None
+    if -127 <= number <= 127 and str(number) == value:
+        return number
+    return None
+
+
+def _encode_date(value):
+    try:
+        day = date.fromisoformat(value)
+    except ValueError:
+        return None
+    # Только каноничная запись YYYY-MM-DD восстанавливается без потерь
+    return day.toordinal() if day.isoformat() == value else None
+
+
+def _to_little_endian(values):
+    if sys.byteorder != "little":
+        values = array(values.typecode, values)
+        values.byteswap()
+    return values
+
+
+class SnapshotWriter:
+    """Потоковая запись снимка: строки накапливаются группами по row_group_size."""
+
+    def __init__(self, path, columns, row_group_size=ROW_GROUP_SIZE):
+        self.path = path
+        self.columns = list(columns)
+        self.kinds = [COLUMN_KINDS.get(column, "dict") for column in self.columns]
+        self.row_group_size = row_group_size
+        self.dictionaries = [{} if kind == "dict" else None for kind in self.kinds]
+        self.row_groups = []
+        self.pending = []
+        self.file = open(path, 'wb')
+        self.file.write(MAGIC)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+        else:
+            self.file.close()
+            os.unlink(self.path)
+
+    def write(self, records):
+        """Запись кортежей значений колонок columns."""
+        for record in records:
+            self.pending.append(record)
+            if len(self.pending) >= self.row_group_size:
+                self._flush()
+
+    def _encode(self, index, values):
+        """Коды колонки группы и исключения {номер строки: значение}."""
+        kind = self.kinds[index]
+        exceptions = {}
+        if kind == "dict":
+            dictionary = self.dictionaries[index]
+            codes = array("I", [dictionary.setdefault(value, len(dictionary)) for value in values])
+            return codes, exceptions
+
+        encode = _encode_int8 if kind == "int8" else _encode_date
+        sentinel = SENTINELS[kind]
+        codes = array(TYPECODES[kind])
+        for row, value in enumerate(values):
+            code = encode(value)
+            if code is None:
+                exceptions[row] = value
+                code = sentinel
+            codes.append(code)
+        return codes, exceptions
+
+    def _flush(self):
+        if not self.pending:
+            return
+        chunks = []
+        for index, values in enumerate(zip(*self.pending)):
+            codes, exceptions = self._encode(index, values)
+            data = _to_little_endian(codes).tobytes()
+            chunks.append({"offset": self.file.tell(), "length": len(data), "exceptions": exceptions})
+            self.file.write(data)
+        self.row_groups.append({"rows": len(self.pending), "chunks": chunks})
+        self.pending = []
+
+    def close(self):
+        """Запись последней группы и footer."""
+        self._flush()
+        footer = json.dumps({
+            "version": 1,
+            "columns": [{"name": column, "kind": kind} for column, kind in zip(self.columns, self.kinds)],
+            "dictionaries": {
+                column: list(dictionary)
+                for column, dictionary in zip(self.columns, self.dictionaries) if dictionary is not None
+            },
+            "row_groups": self.row_groups,
+        }, ensure_ascii=False).encode("utf-8")
+        self.file.write(footer)
+        self.file.write(TRAILER.pack(len(footer)))
+        self.file.write(MAGIC)
+        self.file.close()
+
+
+def write_snapshot(path, columns, records, row_group_size=ROW_GROUP_SIZE):
+    """Запись снимка из кортежей значений колонок columns; возвращает число строк."""
+    count = 0
+
+    def counted():
+        nonlocal count
+        for record in records:
+            count += 1
+            yield record
+
+    with SnapshotWriter(path, columns, row_group_size) as writer:
+        writer.write(counted())
+    return count
+
+
+def _read_footer(mm, file):
+    size = len(mm)
+    tail = TRAILER.size + len(MAGIC)
+    if size < len(MAGIC) + tail or mm[:len(MAGIC)] != MAGIC or mm[size - len(MAGIC):] != MAGIC:
+        raise ValueError(f"Файл '{file}' не является снимком отчета")
+    (length,) = TRAILER.unpack(mm[size - tail:size - len(MAGIC)])
+    return json.loads(mm[size - tail - length:size - tail].decode("utf-8"))
+
+
+def _read_codes(mm, kind, chunk):
+    """Коды колонки группы в виде array в порядке байт платформы."""
+    codes = array(TYPECODES[kind])
+    codes.frombytes(mm[chunk["offset"]:chunk["offset"] + chunk["length"]])
+    if sys.byteorder != "little":
+        codes.byteswap()
+    return codes
+
+
+def decode_column(codes, kind, exceptions, dictionary):
+    """Значения колонки группы в виде строк, как при чтении CSV."""
+    if kind == "dict":
+        values = list(map(dictionary.__getitem__, codes))
+    elif kind == "int8":
+        values = list(map(INT8_STRINGS.__getitem__, codes))
+    else:
+        days = {code: date.fromordinal(code).isoformat() for code in set(codes) if code}
+        days[0] = ""
+        values = list(map(days.__getitem__, codes))
+    for row, value in exceptions.items():
+        values[row] = value
+    return values
+
+
+@contextmanager
+def open_columns(file, fields):
+    """Колонки fields снимка без декодирования значений.
+
+    Отдает виды колонок, их словари (None для колонок без словаря) и
+    итератор групп строк: группа — список пар (коды array, исключения
+    {номер строки: значение}) в порядке fields. Отсутствие колонки —
+    ошибка всего файла, как и для CSV.
+    """
+    with open(file, 'rb') as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            raise ValueError(f"Файл '{file}' не является снимком отчета")
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            footer = _read_footer(mm, file)
+            names = [column["name"] for column in footer["columns"]]
+            for field in fields:
+                if field not in names:
+                    raise ValueError(f"Поле {field} отсутствует в заголовке файла '{file}'")
+            indices = [names.index(field) for field in fields]
+            kinds = [footer["columns"][index]["kind"] for index in indices]
+            dictionaries = [footer["dictionaries"].get(field) for field in fields]
+
+            def groups():
+                for group in footer["row_groups"]:
+                    chunks = [group["chunks"][index] for index in indices]
+                    yield [
+                        (_read_codes(mm, kind, chunk),
+                         {int(row): value for row, value in chunk["exceptions"].items()})
+                        for kind, chunk in zip(kinds, chunks)
+                    ]
+
+            yield kinds, dictionaries, groups()
+
+
+def iter_records(file, fields):
+    """Кортежи значений колонок fields из снимка.
+
+    Из файла читаются и декодируются только колонки fields.
+    """
+    with open_columns(file, fields) as (kinds, dictionaries, groups):
+        for group in groups:
+            columns = [
+                decode_column(codes, kind, exceptions, dictionary)
+                for (codes, exceptions), kind, dictionary in zip(group, kinds, dictionaries)
+            ]
+            yield from zip(*columns)
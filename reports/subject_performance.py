@@ -0,0 +1,9 @@
+from .groupby import Count, GroupByReport, Mean, Median
+
+
+class SubjectPerformanceReport(GroupByReport):
+    """Отчет о среднем балле по предметам"""
+
+    group_by = ("subject",)
+    aggregates = (Mean(), Median(), Count())
+    headers = ["Subject", "Average Grade", "Median Grade", "Grades"]
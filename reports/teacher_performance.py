@@ -0,0 +1,9 @@
+from .groupby import Count, GroupByReport, Max, Mean, Min
+
+
+class TeacherPerformanceReport(GroupByReport):
+    """Отчет о среднем балле по преподавателям"""
+
+    group_by = ("teacher_name",)
+    aggregates = (Mean(), Min(), Max(), Count())
+    headers = ["Teacher Name", "Average Grade", "Min Grade", "Max Grade", "Grades"]
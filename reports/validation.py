@@ -0,0 +1,142 @@
+"""Политики валидации строк и учет отклоненных строк.
+
+Проверка выполняется в том же проходе, что и разбор: отчет сообщает
+валидатору о каждой неверной строке (reject), а валидатор по политике
+либо прерывает построение отчета, либо пропускает строку и учитывает ее
+в счетчиках и ограниченной выборке примеров. Лимит количества ошибок
+проверяется сразу, доля ошибок — после первых RATIO_MIN_ROWS строк и в
+конце построения отчета. Проверка заголовка (наличие
+колонок) выполняется один раз на файл при чтении и всегда является
+ошибкой файла.
+
+Политики:
+    default — пустое обязательное поле прерывает отчет, значение неверного
+              формата пропускается (поведение по умолчанию);
+    strict  — любая неверная строка прерывает отчет;
+    skip    — неверные строки пропускаются и учитываются;
+    budget  — как skip, но отчет прерывается, если неверных строк больше
+              max_errors или их доля больше max_ratio.
+"""
+from collections import Counter
+import json
+
+POLICIES = ("default", "strict", "skip", "budget")
+# Доля ошибок проверяется, только когда строк достаточно для оценки
+RATIO_MIN_ROWS = 1000
+
+EMPTY = "empty"
+FORMAT = "format"
+
+
+class Validator:
+    """Политика валидации со счетчиками ошибок и выборкой отклоненных строк.
+
+    Валидаторы объединяются (merge), поэтому в дочерних процессах
+    используются пустые копии (spawn), а их счетчики затем добавляются к
+    родительскому.
+    """
+
+    def __init__(self, policy="default", max_errors=None, max_ratio=None, sample_size=100):
+        if policy not in POLICIES:
+            raise ValueError(f"Политика валидации '{policy}' не поддерживается.")
+        if policy == "budget" and max_errors is None and max_ratio is None:
+            raise ValueError("Для политики budget нужно задать max_errors или max_ratio")
+        self.policy = policy
+        self.max_errors = max_errors
+        self.max_ratio = max_ratio
+        self.sample_size = sample_size
+        self.rows = 0
+        self.errors = Counter()
+        self.sample = []
+
+    def spawn(self):
+        """Пустой валидатор с той же политикой."""
+        return Validator(self.policy, self.max_errors, self.max_ratio, self.sample_size)
+
+    @property
+    def rejected(self):
+        """Количество отклоненных строк."""
+        return sum(self.errors.values())
+
+    def reject(self, kind, field, row, message):
+        """Учет неверной строки; по политике возбуждает ValueError."""
+        if self.policy == "strict" or (self.policy == "default" and kind == EMPTY):
+            raise ValueError(message)
+        self.errors[f"{kind}:{field}"] += 1
+        if len(self.sample) < self.sample_size:
+            self.sample.append({"error": kind, "field": field, "message": message, "row": row})
+        if self.max_errors is not None and self.rejected > self.max_errors:
+            raise ValueError(f"Превышен лимит неверных строк ({self.max_errors}): {message}")
+        self.check_budget()
+
+    def check_budget(self, final=False):
+        """Проверка доли неверных строк (при final — независимо от числа строк)."""
+        if self.max_ratio is None or not self.rows or (self.rows < RATIO_MIN_ROWS and not final):
+            return
+        ratio = self.rejected / self.rows
+        if ratio > self.max_ratio:
+            raise ValueError(f"Доля неверных строк {ratio:.2%} превышает допустимую {self.max_ratio:.2%}")
+
+    def merge(self, other):
+        """Добавление счетчиков и выборки другого валидатора."""
+        self.rows += other.rows
+        self.errors.update(other.errors)
+        self.sample.extend(other.sample[:self.sample_size - len(self.sample)])
+        if self.max_errors is not None and self.rejected > self.max_errors:
+            raise ValueError(f"Превышен лимит неверных строк ({self.max_errors})")
+        self.check_budget()
+        return self
+
+    def summary(self):
+        """Счетчики проверенных и отклоненных строк."""
+        return {"rows": self.rows, "rejected": self.rejected, "errors": dict(self.errors)}
+
+    def write_rejects(self, path):
+        """Запись выборки отклоненных строк в файл (JSON Lines)."""
+        with open(path, 'w', encoding='utf-8') as f:
+            for entry in self.sample:
+                f.write(json.dumps(entry, ensure_ascii=False))
+                f.write("\n")
+
+
+class ScanValidator:
+    """Валидатор для нескольких отчетов, которые проверяют одни и те же строки.
+
+    Строки пачки добавляются к validator один раз (start_batch). Каждый
+    отчет проходит пачку заново (rewind), и его счетчик rows служит номером
+    текущей строки, поэтому строка, уже отклоненная другим отчетом,
+    повторно не учитывается.
+    """
+
+    def __init__(self, validator):
+        self.validator = validator
+        self.policy = validator.policy
+        self.rows = 0
+        self.rejected_rows = set()
+
+    def start_batch(self, size):
+        """Учет новой пачки из size строк."""
+        self.validator.rows += size
+        self.rejected_rows.clear()
+        self.rows = 0
+
+    def rewind(self):
+        """Начало прохода следующего отчета по той же пачке."""
+        self.rows = 0
+
+    def reject(self, kind, field, row, message):
+        """Учет неверной строки, если она еще не отклонена в этой пачке."""
+        if self.rows in self.rejected_rows:
+            return
+        self.rejected_rows.add(self.rows)
+        self.validator.reject(kind, field, row, message)
+
+
+def validated(function, validator, *args):
+    """Вызов function(*args, validator=...) с отдельным валидатором.
+
+    Возвращает результат и валидатор; используется для задач, которые могут
+    выполняться в дочерних процессах.
+    """
+    child = validator.spawn()
+    return function(*args, validator=child), child
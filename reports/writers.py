@@ -0,0 +1,44 @@
+"""Потоковые форматы вывода отчетов.
+
+Каждый писатель получает заголовки и итератор строк и пишет их сразу в
+поток, не собирая всю таблицу в одну строку. Формат grid использует
+tabulate (импортируется только для этого формата) и предназначен для
+небольших отчетов в терминале.
+"""
+import csv
+import json
+
+
+def write_grid(stream, headers, rows):
+    """Таблица в рамке (tabulate, формат grid)."""
+    from tabulate import tabulate
+    stream.write(tabulate(list(rows), headers=headers, tablefmt="grid"))
+    stream.write("\n")
+
+
+def write_csv(stream, headers, rows, delimiter=","):
+    """CSV с заголовком."""
+    writer = csv.writer(stream, delimiter=delimiter, lineterminator="\n")
+    writer.writerow(headers)
+    writer.writerows(rows)
+
+
+def write_tsv(stream, headers, rows):
+    """Значения, разделенные табуляцией."""
+    write_csv(stream, headers, rows, delimiter="\t")
+
+
+def write_jsonl(stream, headers, rows):
+    """Один JSON объект на строку."""
+    dumps = json.JSONEncoder(ensure_ascii=False).encode
+    for row in rows:
+        stream.write(dumps(dict(zip(headers, row))))
+        stream.write("\n")
+
+
+WRITERS = {
+    "grid": write_grid,
+    "csv": write_csv,
+    "tsv": write_tsv,
+    "jsonl": write_jsonl,
+}
@@ -2,11 +2,19 @@ import sys
 
 import pytest
 import csv
+import io
+import json
 import os
 from unittest.mock import patch, mock_open
 
-from reports import ReportFactory, StudentPerformanceReport
-from reports.base_report import BaseReport
+from reports import (
+    IncrementalState, Metrics, MonthlyPerformanceReport, PartialCache, ReportFactory,
+    StudentPerformanceReport, SubjectPerformanceReport, TeacherPerformanceReport, Validator,
+)
+from reports.base_report import BaseReport, project_records
+from reports.groupby import QuantileSketch
+from reports.server import ReportStore, make_server
+from reports.snapshot import write_snapshot
 
 
 class TestBaseReport:
@@ -46,6 +54,37 @@ class TestBaseReport:
         data = BaseReport.read_data_from_csv(temp_csv_files)
         assert len(data) == len(sample_student_data)
 
+    def test_iter_data_from_csv_is_lazy(self, temp_csv_files, sample_student_data):
+        """Тест потокового чтения: строки отдаются по одной, а не списком"""
+        rows = BaseReport.iter_data_from_csv(temp_csv_files)
+
+        assert not isinstance(rows, list)
+        first = next(rows)
+        assert first['student_name'] == sample_student_data[0]['student_name']
+        assert 1 + sum(1 for _ in rows) == len(sample_student_data)
+
+
+    def test_iter_records_projects_fields(self, temp_csv_files, sample_student_data):
+        """Тест чтения только нужных колонок в виде кортежей"""
+        records = list(BaseReport.iter_records(temp_csv_files, ("grade", "student_name")))
+
+        assert records == [(row['grade'], row['student_name']) for row in sample_student_data]
+
+    def test_iter_records_missing_column(self, tmp_path):
+        """Тест проверки колонок по заголовку один раз на файл"""
+        path = tmp_path / "no_grade.csv"
+        path.write_text("student_name,subject\nJohn Doe,Math\n")
+
+        with pytest.raises(ValueError, match="Поле grade отсутствует в заголовке файла"):
+            list(StudentPerformanceReport.iter_records([str(path)]))
+
+    def test_iter_records_short_and_blank_rows(self, tmp_path):
+        """Тест, что пустые строки пропускаются, а недостающие поля пустые"""
+        path = tmp_path / "short.csv"
+        path.write_text("student_name,subject,grade\nJohn Doe,Math,5\n\nJane Smith\n")
+
+        assert list(StudentPerformanceReport.iter_records([str(path)])) == [("John Doe", "5"), ("Jane Smith", "")]
+
 
 class TestStudentPerformanceReport:
     """Тесты для отчета об успеваемости студентов"""
@@ -152,6 +191,13 @@ class TestStudentPerformanceReport:
         assert performance[0]['student_name'] == 'John Doe'
         assert performance[0]['avg_grade'] == 4.0  # (5+4+3)/3 = 4.0
 
+    def test_calculate_performance_from_iterator(self, sample_student_data):
+        """Тест однопроходного расчета по потоку строк"""
+        from_list = StudentPerformanceReport(sample_student_data).calculate_performance()
+        from_stream = StudentPerformanceReport(iter(sample_student_data)).calculate_performance()
+
+        assert from_stream == from_list
+
     def test_generate_report_valid(self, sample_student_data):
         """Тест генерации отчета с валидными данными"""
         report = StudentPerformanceReport(sample_student_data)
@@ -181,6 +227,1170 @@ class TestStudentPerformanceReport:
         assert grades == sorted(grades, reverse=True)
 
 
+    @pytest.mark.parametrize("options, window", [
+        ({"top": 3}, slice(0, 3)),
+        ({"bottom": 3}, slice(-3, None)),
+        ({"offset": 2, "limit": 4}, slice(2, 6)),
+        ({"top": 5, "offset": 3, "limit": 10}, slice(3, 5)),
+        ({"bottom": 4, "offset": 1, "limit": 2}, slice(-3, -1)),
+        ({"top": 100}, slice(None)),
+    ])
+    def test_calculate_performance_selection(self, sample_student_data, options, window):
+        """Тест выборки top/bottom и постраничного вывода относительно полной сортировки"""
+        report = StudentPerformanceReport(sample_student_data)
+        full = report.calculate_performance()
+
+        assert report.calculate_performance(**options) == full[window]
+
+    def test_calculate_performance_ties_ordered_by_name(self):
+        """Тест детерминированного порядка студентов с одинаковым баллом"""
+        data = [
+            {'student_name': name, 'grade': '4'} for name in ['Charlie', 'Alice', 'Bob']
+        ]
+        report = StudentPerformanceReport(data)
+
+        assert [item['student_name'] for item in report.calculate_performance()] == ['Alice', 'Bob', 'Charlie']
+        assert [item['student_name'] for item in report.calculate_performance(top=2)] == ['Alice', 'Bob']
+        assert [item['student_name'] for item in report.calculate_performance(bottom=1)] == ['Charlie']
+
+    def test_calculate_performance_top_and_bottom_conflict(self, sample_student_data):
+        """Тест, что top и bottom нельзя задать одновременно"""
+        report = StudentPerformanceReport(sample_student_data)
+
+        with pytest.raises(ValueError, match="top и bottom"):
+            report.calculate_performance(top=1, bottom=1)
+
+    @pytest.mark.parametrize("selection", [{"top": -1}, {"bottom": -1}, {"offset": -2}, {"limit": -1}])
+    def test_negative_selection_rejected(self, sample_student_data, selection):
+        """Тест, что отрицательные значения выборки отклоняются"""
+        report = StudentPerformanceReport(sample_student_data)
+
+        with pytest.raises(ValueError, match="не может быть отрицательным"):
+            report.select(**selection)
+
+
+class TestGroupByReport:
+    """Тесты обобщенной группировки с агрегатами"""
+
+    DATA = [
+        {'student_name': 'A', 'subject': 'Math', 'teacher_name': 'T1', 'date': '2023-09-16', 'grade': '5'},
+        {'student_name': 'B', 'subject': 'Math', 'teacher_name': 'T2', 'date': '2023-09-20', 'grade': '3'},
+        {'student_name': 'C', 'subject': 'Math', 'teacher_name': 'T1', 'date': '2023-10-02', 'grade': '4'},
+        {'student_name': 'A', 'subject': 'History', 'teacher_name': 'T2', 'date': '2023-10-05', 'grade': '2'},
+    ]
+
+    def test_subject_report(self):
+        """Тест среднего, медианы и количества оценок по предметам"""
+        report = SubjectPerformanceReport(self.DATA)
+        assert report.rows() == [("Math", 4.0, 4.0, 3), ("History", 2.0, 2.0, 1)]
+
+    def test_teacher_report(self):
+        """Тест минимума и максимума оценок по преподавателям"""
+        report = TeacherPerformanceReport(self.DATA)
+        assert report.rows() == [("T1", 4.5, 4, 5, 2), ("T2", 2.5, 2, 3, 2)]
+
+    def test_monthly_report(self):
+        """Тест группировки по месяцу даты"""
+        report = MonthlyPerformanceReport(self.DATA)
+        assert report.rows() == [("2023-09", 4.0, 2), ("2023-10", 3.0, 2)]
+
+    @pytest.mark.parametrize("report_class", [SubjectPerformanceReport, TeacherPerformanceReport])
+    def test_merged_partials_match_single_pass(self, report_class):
+        """Тест, что объединение частичных результатов совпадает со сверткой целиком"""
+        records = list(report_class.project(self.DATA))
+        partials = [report_class.aggregate(records[:2]), report_class.aggregate(records[2:])]
+        merged = report_class.merge_partials(partials)
+
+        assert merged == report_class.aggregate(records)
+        # Исходные частичные результаты не изменяются при объединении
+        assert partials[0] == report_class.aggregate(records[:2])
+
+    def test_quantile_sketch_relative_accuracy(self):
+        """Тест точности и объединяемости скетча квантилей"""
+        import random
+        rng = random.Random(0)
+        values = [rng.lognormvariate(0, 2) for _ in range(10000)]
+        left, right = QuantileSketch(), QuantileSketch()
+        for index, value in enumerate(values):
+            (left if index % 2 else right).add(value)
+        sketch = left.merge(right)
+
+        ordered = sorted(values)
+        for q in (0.1, 0.5, 0.9, 0.99):
+            exact = ordered[int(q * (len(ordered) - 1))]
+            assert abs(sketch.quantile(q) - exact) <= exact * QuantileSketch.RELATIVE_ACCURACY * 1.01
+
+    def test_numpy_engine_falls_back_for_sketches(self, temp_csv_files):
+        """Тест, что отчеты с дополнительными слотами считаются построчно"""
+        expected = ReportFactory.create_report("subject_performance", temp_csv_files)
+        report = ReportFactory.create_report("subject_performance", temp_csv_files, engine="numpy")
+        assert report.rows() == expected.rows()
+
+
+class TestWriters:
+    """Тесты потоковых форматов вывода"""
+
+    def test_write_grid_matches_generate(self, sample_student_data):
+        """Тест, что формат grid совпадает с результатом generate"""
+        report = StudentPerformanceReport(sample_student_data)
+        stream = io.StringIO()
+        report.write(stream, "grid", top=5)
+
+        assert stream.getvalue() == report.generate(top=5) + "\n"
+
+    def test_write_empty_report(self):
+        """Тест записи отчета без данных"""
+        with pytest.raises(ValueError, match="Нет данных для отчета"):
+            StudentPerformanceReport([]).write(io.StringIO(), "csv")
+
+    def test_write_unknown_format(self, sample_student_data):
+        """Тест неизвестного формата вывода"""
+        with pytest.raises(ValueError, match="Формат 'xml' не поддерживается"):
+            StudentPerformanceReport(sample_student_data).write(io.StringIO(), "xml")
+
+
+class TestColumnarEngine:
+    """Тесты колоночного движка агрегации"""
+
+    @pytest.fixture(autouse=True)
+    def require_numpy(self):
+        pytest.importorskip("numpy")
+
+    def test_numpy_engine_matches_python(self, temp_csv_files):
+        """Тест, что колоночный движок дает тот же результат, что и построчный"""
+        expected = ReportFactory.create_report("students_performance", temp_csv_files)
+        report = ReportFactory.create_report("students_performance", temp_csv_files, engine="numpy")
+
+        assert report.totals == expected.totals
+        assert report.calculate_performance() == expected.calculate_performance()
+
+    def test_numpy_engine_small_batches(self, temp_csv_files):
+        """Тест, что разбиение на пакеты не влияет на результат"""
+        from reports import columnar
+
+        expected = StudentPerformanceReport.aggregate_file(temp_csv_files[0])
+        assert columnar.aggregate_file(temp_csv_files[0], batch_size=3, block_size=64) == expected
+
+    def test_numpy_engine_short_and_blank_rows(self, tmp_path):
+        """Тест коротких и пустых строк и порядка имен между пакетами"""
+        from reports import columnar
+
+        path = tmp_path / "grades.csv"
+        path.write_text("student_name,grade\nBob,5\n\nAmy,4\nShort\nCid,3\nAmy,5\n")
+        validator = Validator(policy="skip")
+
+        result = columnar.aggregate_file(str(path), batch_size=2, validator=validator)
+        expected = StudentPerformanceReport.aggregate_file(str(path), validator=Validator(policy="skip"))
+        assert result == expected
+        assert list(result) == ["Bob", "Amy", "Cid"]
+        assert validator.rows == 5
+
+    @pytest.mark.parametrize("newline", ["\n", "\r\n", "\r"])
+    def test_numpy_engine_byte_blocks(self, tmp_path, newline):
+        """Тест разбора по байтам: блоки с кавычками, короткие и пустые строки, неверные оценки"""
+        from reports import columnar
+
+        lines = ["student_name,grade,note", "Bob,5,a", "", "Amy,x,b", '"Cid\nJr",4,c', "Short",
+                 "Bob,05,d", ",3,e", "Amy,,f", "Cid,+4,g", "Ёжик,3,h"]
+        path = tmp_path / "grades.csv"
+        path.write_bytes((newline.join(lines) + newline).encode("utf-8"))
+        for block_size in (1, 16, columnar.BLOCK_SIZE):
+            validator, expected_validator = Validator("skip"), Validator("skip")
+            result = columnar.aggregate_file(str(path), validator=validator, block_size=block_size)
+
+            assert result == StudentPerformanceReport.aggregate_file(str(path), validator=expected_validator)
+            assert validator.summary() == expected_validator.summary()
+            assert validator.sample == expected_validator.sample
+
+    def test_numpy_engine_snapshot_codes(self, tmp_path, monkeypatch):
+        """Тест свертки снимка по кодам колонок без декодирования значений в строки"""
+        from reports import columnar, snapshot
+
+        path = tmp_path / "grades.csv"
+        path.write_text("student_name,grade\nBob,5\nAmy,x\n,3\nBob,200\nAmy,\nCid,-7\nAmy,4\n")
+        snap = str(tmp_path / "grades.snap")
+        write_snapshot(snap, StudentPerformanceReport.fields,
+                       StudentPerformanceReport.iter_records([str(path)]), row_group_size=3)
+        expected_validator = Validator("skip")
+        expected = StudentPerformanceReport.aggregate_file(str(path), validator=expected_validator)
+
+        monkeypatch.setattr(snapshot, "decode_column", None)
+        validator = Validator("skip")
+        assert columnar.aggregate_file(snap, validator=validator) == expected
+        assert validator.summary() == expected_validator.summary()
+        assert validator.sample == expected_validator.sample
+
+    def test_numpy_engine_empty_field_raises(self, invalid_csv_file):
+        """Тест, что пустые поля вызывают ошибку, как в построчном движке"""
+        with pytest.raises(ValueError, match="не может быть пустым"):
+            ReportFactory.create_report("students_performance", [invalid_csv_file], engine="numpy")
+
+    def test_numpy_engine_skips_bad_format(self, tmp_path):
+        """Тест, что оценки неверного формата пропускаются"""
+        path = tmp_path / "grades.csv"
+        path.write_text("student_name,grade\nJohn Doe,5\nJane Smith,invalid\nJohn Doe,4\n")
+
+        report = ReportFactory.create_report("students_performance", [str(path)], engine="numpy")
+        assert report.totals == {"John Doe": [9, 2]}
+
+    def test_numpy_engine_fallback_without_numpy(self, temp_csv_files, monkeypatch):
+        """Тест перехода на построчный движок, если NumPy не установлен"""
+        from reports import columnar
+
+        monkeypatch.setattr(columnar, "np", None)
+        expected = ReportFactory.create_report("students_performance", temp_csv_files)
+        report = ReportFactory.create_report("students_performance", temp_csv_files, engine="numpy")
+
+        assert report.totals == expected.totals
+
+
+class TestChunkedReader:
+    """Тесты чтения файлов через mmap по диапазонам байт"""
+
+    TRICKY_ROWS = [
+        ['student_name', 'subject', 'grade'],
+        ['Doe, John', 'Math', '5'],
+        ['Jane "JJ" Smith', 'Sci\nence', '4'],
+        ['"Quoted"', '', '3'],
+        ['Multi\nline\n"name"', 'History', '2'],
+        ['Bob', 'a,b,"c"', '5'],
+    ] + [[f'Student {i}', f'line\n{i}' if i % 3 else 'plain', str(i % 5 + 1)] for i in range(40)]
+
+    @pytest.fixture(params=["\n", "\r\n"], ids=["lf", "crlf"])
+    def tricky_csv_file(self, tmp_path, request):
+        path = tmp_path / "tricky.csv"
+        with open(path, 'w', newline='') as f:
+            csv.writer(f, lineterminator=request.param).writerows(self.TRICKY_ROWS)
+        return str(path)
+
+    @pytest.fixture
+    def stray_quotes_file(self, tmp_path):
+        # Кавычки вне RFC 4180, которые csv.reader читает как обычные символы
+        path = tmp_path / "stray.csv"
+        path.write_text("student_name,subject,grade\n"
+                        'O"Brien,Math,1\n'
+                        + "".join(f"Student {i},Math,{i % 5 + 1}\n" for i in range(20))
+                        + '"multi\nline",Science,2\n'
+                        '"abc"def,"x,"y",3\n'
+                        + "".join(f'"Student\n{i}",Math,{i % 5 + 1}\n' for i in range(20))
+                        + 'Unclosed,Math,"4\nTail,Math,5\n')
+        return str(path)
+
+    @pytest.fixture
+    def misleading_quotes_file(self, tmp_path):
+        # Строки внутри полей в кавычках, которые вне кавычек выглядят как
+        # начало записи: угаданное по такому смещению начало диапазона неверно
+        path = tmp_path / "misleading.csv"
+        with open(path, 'w', newline='') as f:
+            csv.writer(f, lineterminator="\n").writerows(
+                [['student_name', 'subject', 'grade']]
+                + [[f'Student {i}', f'x\n"y\nbad,row,z\n', str(i % 5 + 1)] for i in range(60)]
+            )
+        return str(path)
+
+    @staticmethod
+    def assert_ranges_match_dict_reader(file, parts):
+        from reports import chunked
+
+        with open(file, 'r') as f:
+            reader = csv.DictReader(f)
+            expected = [(row['student_name'], row['grade']) for row in reader]
+
+        def parse(start, end, exact=False):
+            bounds = chunked.range_bounds(file, start, end, exact)
+            rows = chunked.iter_range_rows(file, *bounds)
+            return bounds, list(project_records(rows, StudentPerformanceReport.fields, file, header))
+
+        redone = []
+
+        def redo(start, end):
+            redone.append(start)
+            return parse(start, end, exact=True)
+
+        header, ranges = chunked.split_file(file, parts)
+        results = [parse(start, end, exact=index == 0) for index, (start, end) in enumerate(ranges)]
+        joined = chunked.join_ranges(ranges, results, redo)
+        records = [record for _, range_records in joined for record in range_records]
+
+        assert header == reader.fieldnames
+        assert len(ranges) <= parts
+        assert records == expected
+        return [bounds for bounds, _ in joined if bounds[0] < bounds[1]], redone
+
+    @pytest.mark.parametrize("parts", [1, 2, 3, 7, 50])
+    def test_ranges_match_dict_reader(self, tricky_csv_file, parts):
+        """Тест, что разбор по диапазонам совпадает с csv.DictReader"""
+        self.assert_ranges_match_dict_reader(tricky_csv_file, parts)
+
+    @pytest.mark.parametrize("parts", [1, 2, 3, 7, 50])
+    def test_stray_quotes_match_dict_reader(self, stray_quotes_file, parts):
+        """Тест, что кавычки вне RFC 4180 не сдвигают границы диапазонов"""
+        ranges, _ = self.assert_ranges_match_dict_reader(stray_quotes_file, parts)
+        # Одиночная кавычка в начале файла не отменяет последующие границы
+        assert len(ranges) > 1 or parts == 1
+
+    @pytest.mark.parametrize("parts", [7, 50])
+    def test_misguessed_range_start_is_redone(self, misleading_quotes_file, parts):
+        """Тест, что неверно угаданное начало диапазона исправляется при объединении"""
+        _, redone = self.assert_ranges_match_dict_reader(misleading_quotes_file, parts)
+
+        assert redone
+
+    def test_create_report_mmap_parallel_misguessed_start(self, misleading_quotes_file):
+        """Тест, что строгая проверка не срабатывает на мусоре неверно угаданного диапазона"""
+        expected = ReportFactory.create_report("students_performance", [misleading_quotes_file])
+        report = ReportFactory.create_report(
+            "students_performance", [misleading_quotes_file], workers=7, reader="mmap",
+            validator=Validator("strict"),
+        )
+
+        assert report.totals == expected.totals
+
+    def test_iter_records_mmap(self, tricky_csv_file):
+        """Тест потокового чтения через mmap"""
+        expected = list(StudentPerformanceReport.iter_records([tricky_csv_file]))
+
+        assert list(StudentPerformanceReport.iter_records([tricky_csv_file], reader="mmap")) == expected
+
+    def test_create_report_mmap_parallel(self, temp_csv_files, tricky_csv_file):
+        """Тест, что параллельный разбор диапазонов дает тот же отчет"""
+        files = temp_csv_files + [tricky_csv_file]
+        expected = ReportFactory.create_report("students_performance", files)
+        report = ReportFactory.create_report("students_performance", files, workers=3, reader="mmap")
+
+        assert report.totals == expected.totals
+
+    def test_mmap_empty_and_missing_files(self, tmp_path, non_existent_file):
+        """Тест пустого и несуществующего файла"""
+        path = tmp_path / "empty.csv"
+        path.write_text("")
+
+        assert list(StudentPerformanceReport.iter_records([str(path)], reader="mmap")) == []
+        with pytest.raises(FileNotFoundError, match="не найден"):
+            ReportFactory.create_report("students_performance", [non_existent_file], reader="mmap")
+
+
+class TestAsyncReader:
+    """Тесты конкурентного чтения множества файлов"""
+
+    @pytest.fixture
+    def many_files(self, tmp_path, sample_student_data):
+        paths = []
+        for index in range(12):
+            path = tmp_path / f"part{index}.csv"
+            with open(path, 'w', newline='') as f:
+                writer = csv.DictWriter(f, fieldnames=list(sample_student_data[0]))
+                writer.writeheader()
+                writer.writerows(sample_student_data[index:index + 4])
+            paths.append(str(path))
+        return paths
+
+    def test_async_matches_sequential(self, many_files):
+        """Тест, что результат не зависит от порядка завершения чтений"""
+        expected = ReportFactory.create_report("students_performance", many_files)
+        report = ReportFactory.create_report("students_performance", many_files, reader="async", concurrency=4)
+
+        assert report.rows() == expected.rows()
+
+    def test_async_several_reports(self, many_files):
+        """Тест общего прохода нескольких отчетов при конкурентном чтении"""
+        names = ["students_performance", "subject_performance"]
+        expected = ReportFactory.create_reports(names, many_files)
+        reports = ReportFactory.create_reports(names, many_files, reader="async")
+
+        assert [report.rows() for report in reports] == [report.rows() for report in expected]
+
+    def test_async_concurrency_limit(self, many_files, monkeypatch):
+        """Тест, что одновременно читается не больше concurrency файлов"""
+        import threading
+        import time
+        from reports import async_reader
+
+        active, peak, lock = [0], [0], threading.Lock()
+        original = async_reader.read_text
+
+        def slow_read(file):
+            with lock:
+                active[0] += 1
+                peak[0] = max(peak[0], active[0])
+            time.sleep(0.01)
+            with lock:
+                active[0] -= 1
+            return original(file)
+
+        monkeypatch.setattr(async_reader, "read_text", slow_read)
+        ReportFactory.create_report("students_performance", many_files, reader="async", concurrency=3)
+
+        assert 1 < peak[0] <= 3
+
+    def test_async_nonexistent_file(self, many_files, non_existent_file):
+        """Тест, что ошибка чтения сохраняет тип и сообщение с именем файла"""
+        with pytest.raises(FileNotFoundError, match="не найден"):
+            ReportFactory.create_report("students_performance", [*many_files, non_existent_file], reader="async")
+
+    def test_async_invalid_data(self, invalid_csv_file):
+        """Тест, что ошибки валидации пробрасываются без изменений"""
+        with pytest.raises(ValueError, match="не может быть пустым"):
+            ReportFactory.create_report("students_performance", [invalid_csv_file], reader="async")
+
+
+class TestInputs:
+    """Тесты каталогов, шаблонов и сжатых входных файлов"""
+
+    OPENERS = {".gz": "gzip", ".bz2": "bz2", ".xz": "lzma"}
+
+    @pytest.fixture
+    def archive(self, tmp_path, temp_csv_files):
+        """Каталог с подкаталогами по датам и сжатыми копиями файлов"""
+        import importlib
+        for index, (suffix, module) in enumerate(self.OPENERS.items()):
+            directory = tmp_path / "archive" / f"2023-09-{index + 1:02d}"
+            directory.mkdir(parents=True)
+            source = temp_csv_files[index % len(temp_csv_files)]
+            with open(source, 'rb') as f, importlib.import_module(module).open(
+                    directory / f"grades.csv{suffix}", 'wb') as out:
+                out.write(f.read())
+        (tmp_path / "archive" / "notes.txt").write_text("не CSV")
+        return tmp_path / "archive"
+
+    def expected(self, temp_csv_files):
+        files = [temp_csv_files[index % len(temp_csv_files)] for index in range(len(self.OPENERS))]
+        return ReportFactory.create_report("students_performance", files).rows()
+
+    def test_directory_expanded_recursively(self, archive, temp_csv_files):
+        """Тест рекурсивного обхода каталога с потоковой распаковкой"""
+        report = ReportFactory.create_report("students_performance", [str(archive)])
+        assert report.rows() == self.expected(temp_csv_files)
+
+    @pytest.mark.parametrize("options", [{"workers": 2}, {"reader": "mmap"}, {"reader": "async"}])
+    def test_glob_pattern_with_options(self, archive, temp_csv_files, options):
+        """Тест шаблона glob при параллельном, mmap и асинхронном чтении"""
+        pattern = str(archive / "**" / "*.csv.*")
+        report = ReportFactory.create_report("students_performance", [pattern], **options)
+        assert report.rows() == self.expected(temp_csv_files)
+
+    def test_glob_without_matches(self, tmp_path):
+        """Тест ошибки для шаблона без совпадений"""
+        with pytest.raises(FileNotFoundError, match="не найдены"):
+            ReportFactory.create_report("students_performance", [str(tmp_path / "*.csv")])
+
+    def test_zstd_file(self, tmp_path, temp_csv_files):
+        """Тест чтения файла, сжатого zstd"""
+        zstd = pytest.importorskip("zstandard")
+        path = tmp_path / "grades.csv.zst"
+        with open(temp_csv_files[0], 'rb') as f:
+            path.write_bytes(zstd.ZstdCompressor().compress(f.read()))
+
+        report = ReportFactory.create_report("students_performance", [str(path)])
+        assert report.rows() == ReportFactory.create_report("students_performance", temp_csv_files[:1]).rows()
+
+    def test_incremental_rejects_compressed(self, archive, tmp_path):
+        """Тест, что инкрементальный режим не принимает сжатые файлы"""
+        with pytest.raises(ValueError, match="несжатые"):
+            ReportFactory.create_report("students_performance", [str(archive)],
+                                        incremental=IncrementalState(str(tmp_path / "state.pkl")))
+
+
+class TestSnapshot:
+    """Тесты двоичного колоночного снимка"""
+
+    COLUMNS = ['student_name', 'subject', 'teacher_name', 'date', 'grade']
+
+    def convert(self, files, path, row_group_size=4):
+        records = BaseReport.iter_records(files, self.COLUMNS)
+        return write_snapshot(str(path), self.COLUMNS, records, row_group_size)
+
+    @pytest.mark.parametrize("report_name", ["students_performance", "subject_performance",
+                                             "teacher_performance", "monthly_performance"])
+    def test_reports_match_csv(self, temp_csv_files, tmp_path, report_name):
+        """Тест, что отчеты по снимку совпадают с отчетами по CSV"""
+        path = tmp_path / "data.snap"
+        assert self.convert(temp_csv_files, path) == 15
+
+        expected = ReportFactory.create_report(report_name, temp_csv_files)
+        assert ReportFactory.create_report(report_name, [str(path)]).rows() == expected.rows()
+
+    def test_values_round_trip(self, tmp_path):
+        """Тест, что значения вне кодировок сохраняются как есть"""
+        source = tmp_path / "odd.csv"
+        source.write_text("student_name,subject,teacher_name,date,grade\n"
+                          "A,Math,T1,2023-09-16,5\n"
+                          "B,Math,T1,16.09.2023,05\n"
+                          "C,,T2,,200\n"
+                          "D,Math,T2,2023-09-17,-3\n")
+        path = tmp_path / "odd.snap"
+        self.convert([str(source)], path, row_group_size=3)
+
+        assert list(BaseReport.iter_records([str(path)], self.COLUMNS)) == \
+            list(BaseReport.iter_records([str(source)], self.COLUMNS))
+
+    def test_invalid_data_errors_preserved(self, invalid_csv_file, tmp_path):
+        """Тест, что ошибки валидации по снимку те же, что и по CSV"""
+        path = tmp_path / "invalid.snap"
+        self.convert([invalid_csv_file], path)
+
+        with pytest.raises(ValueError, match="Поле grade в строке .* не может быть пустым"):
+            ReportFactory.create_report("students_performance", [str(path)])
+
+    def test_missing_column(self, temp_csv_files, tmp_path):
+        """Тест ошибки при отсутствии колонки в снимке"""
+        path = tmp_path / "names.snap"
+        write_snapshot(str(path), ["student_name"], BaseReport.iter_records(temp_csv_files, ["student_name"]))
+
+        with pytest.raises(ValueError, match="Поле grade отсутствует в заголовке"):
+            ReportFactory.create_report("students_performance", [str(path)])
+
+    def test_not_a_snapshot(self, tmp_path):
+        """Тест ошибки при чтении файла другого формата"""
+        path = tmp_path / "fake.snap"
+        path.write_bytes(b"student_name,grade\n")
+
+        with pytest.raises(ValueError, match="не является снимком"):
+            ReportFactory.create_report("students_performance", [str(path)])
+
+    def test_main_convert(self, temp_csv_files, tmp_path, capsys):
+        """Тест команды convert и отчета по снимку при параллельном и асинхронном чтении"""
+        path = tmp_path / "term.snap"
+        with patch('sys.argv', ['main.py', 'convert', '--files', *temp_csv_files, '--output', str(path)]):
+            from main import main
+            main()
+        assert "15" in capsys.readouterr().out
+
+        expected = ReportFactory.create_report("students_performance", temp_csv_files).rows()
+        for options in ({"workers": 2, "reader": "mmap"}, {"reader": "async"}):
+            report = ReportFactory.create_report("students_performance", [str(path), str(path)], **options)
+            assert report.rows() == ReportFactory.create_report(
+                "students_performance", temp_csv_files * 2).rows()
+        assert ReportFactory.create_report("students_performance", [str(path)], engine="numpy").rows() == expected
+
+
+    def test_convert_into_input_directory(self, temp_csv_files, tmp_path):
+        """Тест, что снимок в каталоге с CSV не учитывается при обходе каталога"""
+        import shutil
+        data = tmp_path / "data"
+        data.mkdir()
+        for file in temp_csv_files:
+            shutil.copy(file, data)
+        with patch('sys.argv', ['main.py', 'convert', '--files', str(data), '--output', str(data / "x.snap")]):
+            from main import main
+            main()
+
+        expected = ReportFactory.create_report("students_performance", temp_csv_files).rows()
+        assert ReportFactory.create_report("students_performance", [str(data)]).rows() == expected
+        assert ReportFactory.create_report("students_performance", [str(data / "*.snap")]).rows() == expected
+
+    def test_convert_without_inputs(self, tmp_path, capsys):
+        """Тест понятной ошибки convert для каталога без CSV файлов"""
+        with patch('sys.argv', ['main.py', 'convert', '--files', str(tmp_path), '--output', str(tmp_path / "x.snap")]):
+            from main import main
+            with pytest.raises(SystemExit):
+                main()
+        assert "Error: Не найдены входные CSV файлы" in capsys.readouterr().out
+
+class TestValidation:
+    """Тесты политик валидации и счетчиков отклоненных строк"""
+
+    @pytest.fixture
+    def dirty_csv_file(self, tmp_path):
+        path = tmp_path / "dirty.csv"
+        path.write_text("student_name,subject,teacher_name,date,grade\n"
+                        "John Doe,Math,T1,2023-09-16,5\n"
+                        "Jane Smith,Math,T1,2023-09-16,пять\n"
+                        ",Math,T1,2023-09-16,4\n"
+                        "John Doe,Math,T1,2023-09-17,\n"
+                        "Jane Smith,Math,T1,2023-09-17,3\n")
+        return str(path)
+
+    def test_default_policy(self, dirty_csv_file, capsys):
+        """Тест, что по умолчанию пустое поле прерывает отчет, а неверный формат нет"""
+        with pytest.raises(ValueError, match="не может быть пустым"):
+            ReportFactory.create_report("students_performance", [dirty_csv_file])
+        # Неверный формат больше не печатается в stdout
+        assert capsys.readouterr().out == ""
+
+    def test_strict_policy(self, dirty_csv_file):
+        """Тест, что строгая политика прерывает отчет на первой неверной строке"""
+        with pytest.raises(ValueError, match="Неверный формат данных"):
+            ReportFactory.create_report("students_performance", [dirty_csv_file],
+                                        validator=Validator("strict"))
+
+    @pytest.mark.parametrize("options", [{}, {"workers": 2, "reader": "mmap"}, {"reader": "async"},
+                                         {"engine": "numpy"}])
+    def test_skip_policy_counts(self, dirty_csv_file, options):
+        """Тест, что при skip неверные строки пропускаются и учитываются при любом способе чтения"""
+        if options.get("engine") == "numpy":
+            pytest.importorskip("numpy")
+        validator = Validator("skip")
+        report = ReportFactory.create_report("students_performance", [dirty_csv_file, dirty_csv_file],
+                                             validator=validator, **options)
+
+        assert report.totals == {"John Doe": [10, 2], "Jane Smith": [6, 2]}
+        assert validator.rows == 10
+        assert validator.errors == {"format:grade": 2, "empty:student_name": 2, "empty:grade": 2}
+        assert len(validator.sample) == 6
+
+    def test_monthly_report_rejects_bad_dates(self, tmp_path):
+        """Тест, что дата не в формате YYYY-MM-DD отклоняется, а не обрезается до 7 символов"""
+        path = tmp_path / "dates.csv"
+        path.write_text("student_name,subject,teacher_name,date,grade\n"
+                        "John Doe,Math,T1,2023-09-16,5\n"
+                        "Jane Smith,Math,T1,16.09.2023,4\n"
+                        "Jane Smith,Math,T1,2023/9/1,3\n"
+                        "John Doe,Math,T1,2023-10-02,2\n")
+        validator = Validator("skip")
+        report = ReportFactory.create_report("monthly_performance", [str(path)], validator=validator)
+
+        assert report.rows() == [("2023-09", 5.0, 1), ("2023-10", 2.0, 1)]
+        assert validator.errors == {"format:date": 2}
+        with pytest.raises(ValueError, match="Неверный формат данных"):
+            ReportFactory.create_report("monthly_performance", [str(path)], validator=Validator("strict"))
+
+    def test_budget_policy(self, dirty_csv_file):
+        """Тест прерывания отчета при превышении лимита количества и доли ошибок"""
+        with pytest.raises(ValueError, match="Превышен лимит неверных строк \\(2\\)"):
+            ReportFactory.create_report("students_performance", [dirty_csv_file],
+                                        validator=Validator("budget", max_errors=2))
+        with pytest.raises(ValueError, match="Доля неверных строк 60.00%"):
+            ReportFactory.create_report("students_performance", [dirty_csv_file],
+                                        validator=Validator("budget", max_ratio=0.5))
+        report = ReportFactory.create_report("students_performance", [dirty_csv_file],
+                                             validator=Validator("budget", max_errors=3))
+        assert report.totals == {"John Doe": [5, 1], "Jane Smith": [3, 1]}
+
+    def test_cache_respects_policy(self, dirty_csv_file, tmp_path):
+        """Тест, что результат из кэша другой политики не используется, а счетчики восстанавливаются"""
+        cache = PartialCache(str(tmp_path / "cache"))
+        ReportFactory.create_report("students_performance", [dirty_csv_file], cache=cache,
+                                    validator=Validator("skip"))
+
+        with pytest.raises(ValueError, match="Неверный формат данных"):
+            ReportFactory.create_report("students_performance", [dirty_csv_file], cache=cache,
+                                        validator=Validator("strict"))
+        with pytest.raises(ValueError, match="Превышен лимит неверных строк \\(2\\)"):
+            ReportFactory.create_report("students_performance", [dirty_csv_file], cache=cache,
+                                        validator=Validator("budget", max_errors=2))
+
+        validator = Validator("skip")
+        report = ReportFactory.create_report("students_performance", [dirty_csv_file], cache=cache,
+                                             validator=validator)
+        assert report.totals == {"John Doe": [5, 1], "Jane Smith": [3, 1]}
+        assert validator.rows == 5
+        assert validator.rejected == 3
+        assert len(validator.sample) == 3
+
+    def test_budget_requires_limit(self):
+        """Тест, что для политики budget нужен лимит"""
+        with pytest.raises(ValueError, match="max_errors или max_ratio"):
+            Validator("budget")
+
+    def test_main_rejects(self, dirty_csv_file, tmp_path, capsys):
+        """Тест вывода счетчиков и файла с примерами отклоненных строк"""
+        rejects = tmp_path / "rejects.jsonl"
+        with patch('sys.argv', ['main.py', '--files', dirty_csv_file, '--report', 'students_performance',
+                                '--validation', 'skip', '--rejects', str(rejects)]):
+            from main import main
+            main()
+
+        captured = capsys.readouterr()
+        assert "John Doe" in captured.out
+        assert "Отклонено строк: 3 из 5" in captured.err
+        entries = [json.loads(line) for line in rejects.read_text().splitlines()]
+        assert [entry["error"] for entry in entries] == ["format", "empty", "empty"]
+        assert entries[0]["row"] == {"student_name": "Jane Smith", "grade": "пять"}
+
+    def test_main_several_reports_count_input_rows(self, tmp_path, capsys):
+        """Тест, что при нескольких отчетах лимит и счетчики относятся к входным строкам"""
+        path = tmp_path / "grades.csv"
+        path.write_text("student_name,subject,teacher_name,date,grade\n"
+                        "John Doe,Math,T1,2023-09-16,5\n"
+                        "Jane Smith,Math,T1,2023-09-16,пять\n"
+                        "John Doe,Physics,T2,2023-09-17,x\n"
+                        "Jane Smith,Physics,T2,2023-09-17,3\n")
+        rejects = tmp_path / "rejects.jsonl"
+        with patch('sys.argv', ['main.py', '--files', str(path), '--report', 'students_performance',
+                                'subject_performance', 'teacher_performance', '--validation', 'budget',
+                                '--max-errors', '2', '--rejects', str(rejects)]):
+            from main import main
+            main()
+
+        captured = capsys.readouterr()
+        assert "Error" not in captured.out
+        assert "Отклонено строк: 2 из 4" in captured.err
+        assert len(rejects.read_text().splitlines()) == 2
+
+
+class TestReportServer:
+    """Тесты сервера отчетов с данными в памяти"""
+
+    REPORTS = ["students_performance", "subject_performance"]
+
+    def copy_files(self, files, tmp_path):
+        paths = []
+        for index, file in enumerate(files):
+            path = tmp_path / f"part{index}.csv"
+            with open(file) as f:
+                path.write_text(f.read())
+            paths.append(str(path))
+        return paths
+
+    def test_refresh_only_changed_files(self, temp_csv_files, tmp_path, monkeypatch):
+        """Тест, что при обновлении разбираются только новые и измененные файлы"""
+        files = self.copy_files(temp_csv_files, tmp_path)
+        store = ReportStore(self.REPORTS, [str(tmp_path)])
+        assert store.refresh() == files
+        assert store.refresh() == []
+
+        with open(files[1], 'a') as f:
+            f.write("John Doe,Math,T1,2023-09-17,1\n")
+        scanned = []
+        original = ReportFactory.scan_partials.__func__
+        monkeypatch.setattr(ReportFactory, "scan_partials", classmethod(
+            lambda cls, report_classes, files, *args, **kwargs:
+                scanned.extend(files) or original(cls, report_classes, files, *args, **kwargs)))
+        assert store.refresh() == [files[1]]
+        assert scanned == [files[1]]
+
+        expected = ReportFactory.create_reports(self.REPORTS, files)
+        for report_name, report in zip(self.REPORTS, expected):
+            assert store.report(report_name).rows() == report.rows()
+
+        os.unlink(files[0])
+        assert store.refresh() == [files[0]]
+        assert store.report("students_performance").rows() == \
+            ReportFactory.create_report("students_performance", files[1:]).rows()
+
+    def test_render_cached_until_refresh(self, temp_csv_files, tmp_path):
+        """Тест, что повторный запрос берется из памяти до изменения файлов"""
+        files = self.copy_files(temp_csv_files, tmp_path)
+        store = ReportStore(self.REPORTS, files)
+        store.refresh()
+        first = store.render("students_performance", "jsonl", top=2)
+        assert store.render("students_performance", "jsonl", top=2) is first
+        assert len(first.splitlines()) == 2
+
+        with open(files[0], 'a') as f:
+            f.write("Новый студент,Math,T1,2023-09-17,5\n")
+        store.refresh()
+        assert "Новый студент" in store.render("students_performance", "jsonl")
+
+    def test_refresh_error_keeps_data(self, temp_csv_files, tmp_path):
+        """Тест, что ошибка обновления не меняет данные сервера"""
+        files = self.copy_files(temp_csv_files, tmp_path)
+        store = ReportStore(self.REPORTS, files)
+        store.refresh()
+        rows = store.report("students_performance").rows()
+
+        with open(files[0], 'a') as f:
+            f.write(",Math,T1,2023-09-17,5\n")
+        with pytest.raises(ValueError, match="не может быть пустым"):
+            store.refresh()
+        assert store.report("students_performance").rows() == rows
+
+    def test_refresh_with_deleted_listed_file(self, temp_csv_files, tmp_path):
+        """Тест, что удаленный явно указанный файл не останавливает обновление остальных"""
+        files = self.copy_files(temp_csv_files, tmp_path)
+        store = ReportStore(self.REPORTS, files)
+        store.refresh()
+
+        os.unlink(files[0])
+        with open(files[1], 'a') as f:
+            f.write("Новый студент,Math,T1,2023-09-17,5\n")
+        assert store.refresh() == [files[1], files[0]]
+        assert store.report("students_performance").rows() == \
+            ReportFactory.create_report("students_performance", files[1:]).rows()
+        assert store.status()["missing"] == [files[0]]
+        assert store.status()["files"] == 1
+        assert store.refresh() == []
+
+    @pytest.mark.parametrize("unix", [False, True])
+    def test_http(self, temp_csv_files, tmp_path, unix):
+        """Тест запросов к серверу по TCP и Unix сокету"""
+        import http.client
+        import socket
+        import threading
+
+        store = ReportStore(self.REPORTS, temp_csv_files)
+        store.refresh()
+        socket_path = str(tmp_path / "reports.sock") if unix else None
+        server = make_server(store, port=0, socket_path=socket_path)
+        thread = threading.Thread(target=server.serve_forever, daemon=True)
+        thread.start()
+        try:
+            connection = http.client.HTTPConnection("localhost", server.server_address[1] if not unix else 0)
+            if unix:
+                connection.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+                connection.sock.connect(socket_path)
+
+            def get(path):
+                connection.request("GET", path)
+                response = connection.getresponse()
+                return response.status, response.read().decode("utf-8")
+
+            assert get("/reports") == (200, json.dumps(self.REPORTS))
+            status, body = get("/report/students_performance?format=jsonl&top=1")
+            assert status == 200
+            expected = ReportFactory.create_report("students_performance", temp_csv_files).rows(top=1)
+            assert json.loads(body) == dict(zip(StudentPerformanceReport.headers, expected[0]))
+            assert get("/report/nonexistent")[0] == 404
+            assert get("/report/students_performance?format=xml")[0] == 400
+            assert get("/report/students_performance?offset=-2")[0] == 400
+            assert json.loads(get("/status")[1])["files"] == 2
+            connection.close()
+        finally:
+            server.shutdown()
+            server.server_close()
+
+
+    def test_socket_path_must_be_socket(self, temp_csv_files, tmp_path):
+        """Тест, что по пути --socket удаляется только оставшийся сокет, а не обычный файл"""
+        import socket
+
+        store = ReportStore(self.REPORTS, temp_csv_files)
+        path = tmp_path / "reports.sock"
+        path.write_text("данные")
+        with pytest.raises(ValueError, match="не является сокетом"):
+            make_server(store, socket_path=str(path))
+        assert path.read_text() == "данные"
+
+        path.unlink()
+        stale = socket.socket(socket.AF_UNIX)
+        stale.bind(str(path))
+        stale.close()
+        server = make_server(store, socket_path=str(path))
+        server.server_close()
+
+class TestExternalAggregation:
+    """Тесты внешней агрегации с ограничением памяти"""
+
+    @pytest.fixture
+    def many_students_file(self, tmp_path):
+        import random
+        rng = random.Random(1)
+        path = tmp_path / "many.csv"
+        with open(path, 'w', newline='') as f:
+            writer = csv.writer(f)
+            writer.writerow(['student_name', 'subject', 'teacher_name', 'date', 'grade'])
+            for index in range(3000):
+                writer.writerow([f"Student {rng.randrange(800)}", "Math", f"T{index % 7}",
+                                 f"2023-{index % 12 + 1:02d}-01", rng.randint(1, 5)])
+        return str(path)
+
+    @pytest.mark.parametrize("report_name", ["students_performance", "subject_performance",
+                                             "teacher_performance", "monthly_performance"])
+    def test_matches_in_memory(self, many_students_file, report_name):
+        """Тест, что отчет с выгрузкой на диск совпадает с отчетом в памяти при любой выборке"""
+        from reports.external import SpilledReport, aggregate_external
+
+        report_class = ReportFactory.report_class(report_name)
+        expected = ReportFactory.create_report(report_name, [many_students_file])
+        records = report_class.iter_records([many_students_file])
+        with aggregate_external(report_class, records, memory_limit=1000, partitions=4, batch_size=100) as report:
+            if report_name == "students_performance":
+                assert isinstance(report, SpilledReport)
+            for selection in ({}, {"top": 5}, {"bottom": 5}, {"offset": 10, "limit": 7},
+                              {"top": 20, "offset": 15}, {"bottom": 3, "limit": 2}):
+                assert report.select(**selection) == expected.select(**selection)
+            with pytest.raises(ValueError, match="не может быть отрицательным"):
+                report.select(offset=-2)
+
+    def test_spill_and_cleanup(self, many_students_file, tmp_path):
+        """Тест, что таблица выгружается частями, а временные файлы удаляются"""
+        from reports import external
+
+        spill_dir = tmp_path / "spill"
+        spill_dir.mkdir()
+        aggregator = external.SpillingAggregator(StudentPerformanceReport, 5000, str(spill_dir),
+                                                 partitions=4, batch_size=200)
+        aggregator.add(StudentPerformanceReport.iter_records([many_students_file]))
+        assert aggregator.spills > 1
+        partitions = list(aggregator.iter_partitions())
+        assert len(partitions) > 4
+        merged = StudentPerformanceReport.merge_partials(partitions)
+        assert merged == StudentPerformanceReport.aggregate(StudentPerformanceReport.iter_records([many_students_file]))
+        assert sum(map(len, partitions)) == len(merged)
+        assert os.listdir(spill_dir) == []
+
+        report = ReportFactory.create_report("students_performance", [many_students_file],
+                                             memory_limit=5000, spill_dir=str(spill_dir))
+        assert os.listdir(spill_dir)
+        report.close()
+        assert os.listdir(spill_dir) == []
+
+    def test_fits_in_memory(self, temp_csv_files):
+        """Тест, что при достаточном лимите строится обычный отчет"""
+        report = ReportFactory.create_report("students_performance", temp_csv_files, memory_limit=1024 * 1024)
+        assert isinstance(report, StudentPerformanceReport)
+
+    def test_entry_size_counts_sketch_bins(self):
+        """Тест, что оценка размера накопителя учитывает корзины скетча квантилей"""
+        from reports import external
+
+        small = SubjectPerformanceReport.aggregate([("Math", "5")])
+        large = SubjectPerformanceReport.aggregate([("Math", str(value)) for value in range(1, 5000)])
+        bins = len(large["Math"][SubjectPerformanceReport.slots["sketch"]].positive)
+
+        assert bins > 200
+        assert external.entry_size(SubjectPerformanceReport, large) >= \
+            external.entry_size(SubjectPerformanceReport, small) + bins * QuantileSketch.BIN_BYTES
+
+    def test_unsupported_options(self, temp_csv_files):
+        """Тест ошибок при несовместимых параметрах"""
+        with pytest.raises(ValueError, match="Ограничение памяти"):
+            ReportFactory.create_report("students_performance", temp_csv_files, memory_limit=1000, workers=2)
+        with pytest.raises(ValueError, match="Ограничение памяти"):
+            ReportFactory.create_report("students_performance", temp_csv_files, memory_limit=1000, reader="async")
+        with pytest.raises(ValueError, match="ограничение памяти"):
+            ReportFactory.create_reports(["students_performance", "subject_performance"], temp_csv_files,
+                                         memory_limit=1000)
+
+    def test_main_memory_limit(self, many_students_file, tmp_path):
+        """Тест параметра --memory-limit командной строки"""
+        output = tmp_path / "report.csv"
+        with patch('sys.argv', ['main.py', '--files', many_students_file, '--report', 'students_performance',
+                                '--memory-limit', '1', '--format', 'csv', '--output', str(output)]):
+            from main import main
+            main()
+        expected = io.StringIO()
+        ReportFactory.create_report("students_performance", [many_students_file]).write(expected, "csv")
+        assert output.read_text() == expected.getvalue()
+
+
+class TestPartialCache:
+    """Тесты дискового кэша частичных результатов"""
+
+    def test_unchanged_files_served_from_cache(self, temp_csv_files, tmp_path, monkeypatch):
+        """Тест, что повторный запуск не разбирает неизмененные файлы"""
+        cache = PartialCache(str(tmp_path / "cache"))
+        first = ReportFactory.create_report("students_performance", temp_csv_files, cache=cache)
+
+        calls = []
+        original = StudentPerformanceReport.aggregate_file.__func__
+        monkeypatch.setattr(StudentPerformanceReport, "aggregate_file",
+                            classmethod(lambda cls, file, engine="python", validator=None:
+                                        calls.append(file) or original(cls, file, engine, validator)))
+        second = ReportFactory.create_report("students_performance", temp_csv_files, cache=cache)
+
+        assert calls == []
+        assert second.calculate_performance() == first.calculate_performance()
+
+    def test_changed_file_is_reparsed(self, temp_csv_files, tmp_path):
+        """Тест, что измененный файл разбирается заново"""
+        cache = PartialCache(str(tmp_path / "cache"))
+        ReportFactory.create_report("students_performance", temp_csv_files, cache=cache)
+
+        with open(temp_csv_files[1], 'a') as f:
+            f.write("New Student,Math,T1,2023-09-16,5\n")
+        report = ReportFactory.create_report("students_performance", temp_csv_files, cache=cache)
+
+        assert report.totals["New Student"] == [5, 1]
+
+    def test_file_appended_during_parse_is_reparsed(self, temp_csv_files, tmp_path, monkeypatch):
+        """Тест, что результат сохраняется под ключом файла до чтения, а не после"""
+        cache = PartialCache(str(tmp_path / "cache"))
+        original = StudentPerformanceReport.aggregate_file.__func__
+
+        def append_after_parse(cls, file, engine="python", validator=None):
+            partial = original(cls, file, engine, validator)
+            if file == temp_csv_files[1]:
+                with open(file, 'a') as f:
+                    f.write("New Student,Math,T1,2023-09-16,5\n")
+            return partial
+
+        monkeypatch.setattr(StudentPerformanceReport, "aggregate_file", classmethod(append_after_parse))
+        first = ReportFactory.create_report("students_performance", temp_csv_files, cache=cache)
+        monkeypatch.undo()
+        second = ReportFactory.create_report("students_performance", temp_csv_files, cache=cache)
+
+        assert "New Student" not in first.totals
+        assert second.totals["New Student"] == [5, 1]
+
+    def test_lru_eviction(self, temp_csv_files, tmp_path):
+        """Тест вытеснения давно не использованных записей при превышении лимита"""
+        cache = PartialCache(str(tmp_path / "cache"), max_bytes=0)
+        cache.put(temp_csv_files[0], "ns", {"John Doe": [5, 1]})
+
+        assert cache.entries() == []
+        assert cache.get(temp_csv_files[0], "ns") is None
+
+    def test_lru_keeps_recently_used(self, temp_csv_files, tmp_path):
+        """Тест, что при вытеснении остается последняя использованная запись"""
+        cache = PartialCache(str(tmp_path / "cache"))
+        cache.put(temp_csv_files[0], "ns", {"A": [5, 1]})
+        cache.put(temp_csv_files[1], "ns", {"B": [4, 1]})
+        cache.get(temp_csv_files[0], "ns")
+
+        cache.max_bytes = max(size for _, size, _ in cache.entries())
+        cache.evict()
+
+        assert cache.get(temp_csv_files[0], "ns") == {"A": [5, 1]}
+        assert cache.get(temp_csv_files[1], "ns") is None
+
+
+class TestIncrementalState:
+    """Тесты инкрементальной агрегации дописываемых файлов"""
+
+    HEADER = "student_name,subject,teacher_name,date,grade\n"
+
+    def create(self, files, state_path):
+        return ReportFactory.create_report("students_performance", files,
+                                           incremental=IncrementalState(str(state_path)))
+
+    def test_only_appended_rows_are_parsed(self, tmp_path, monkeypatch):
+        """Тест, что при повторном запуске разбирается только хвост файла"""
+        path = tmp_path / "log.csv"
+        path.write_text(self.HEADER + "John Doe,Math,T1,2023-09-16,5\n")
+        state = tmp_path / "state.pkl"
+        assert self.create([str(path)], state).totals == {"John Doe": [5, 1]}
+
+        with open(path, 'a') as f:
+            f.write("John Doe,Math,T1,2023-09-17,3\nJane Smith,Math,T1,2023-09-17,4\n")
+
+        seen = []
+        original = StudentPerformanceReport.aggregate.__func__
+        monkeypatch.setattr(StudentPerformanceReport, "aggregate",
+                            classmethod(lambda cls, rows, validator=None:
+                                        original(cls, (seen.append(row) or row for row in rows), validator=validator)))
+        report = self.create([str(path)], state)
+
+        assert len(seen) == 2
+        assert report.totals == {"John Doe": [8, 2], "Jane Smith": [4, 1]}
+
+    def test_incomplete_last_line_is_deferred(self, tmp_path):
+        """Тест, что незавершенная последняя строка разбирается в следующий раз"""
+        path = tmp_path / "log.csv"
+        path.write_text(self.HEADER + "John Doe,Math,T1,2023-09-16,5\nJane Smith,Math,T1,2023")
+        state = tmp_path / "state.pkl"
+        assert self.create([str(path)], state).totals == {"John Doe": [5, 1]}
+
+        with open(path, 'a') as f:
+            f.write("-09-17,4\n")
+        assert self.create([str(path)], state).totals == {"John Doe": [5, 1], "Jane Smith": [4, 1]}
+
+    def test_quoted_newline_split_across_writes(self, tmp_path):
+        """Тест, что перевод строки внутри поля в кавычках не завершает запись"""
+        path = tmp_path / "log.csv"
+        path.write_text(self.HEADER + 'John Doe,Math,T1,2023-09-16,5\nJane Smith,"Math\n')
+        state = tmp_path / "state.pkl"
+        assert self.create([str(path)], state).totals == {"John Doe": [5, 1]}
+
+        with open(path, 'a') as f:
+            f.write('and Physics",T1,2023-09-17,4\n')
+        assert self.create([str(path)], state).totals == {"John Doe": [5, 1], "Jane Smith": [4, 1]}
+
+    @pytest.mark.parametrize("options", [{"workers": 2}, {"engine": "numpy"}, {"reader": "mmap"},
+                                         {"cache": "cache"}])
+    def test_conflicting_options_rejected(self, temp_csv_files, tmp_path, options):
+        """Тест, что инкрементальный режим не игнорирует несовместимые параметры молча"""
+        if "cache" in options:
+            options = {"cache": PartialCache(str(tmp_path / "cache"))}
+        with pytest.raises(ValueError, match="Инкрементальный режим поддерживается только"):
+            ReportFactory.create_report("students_performance", temp_csv_files,
+                                        incremental=IncrementalState(str(tmp_path / "state.pkl")), **options)
+
+    @pytest.mark.parametrize("rewrite", [
+        "student_name,subject,teacher_name,date,grade\nBob,Math,T1,2023-09-16,2\n",
+        "student_name,subject,teacher_name,date,grade\nBob,Math,T1,2023-09-16,2\nBob,Math,T1,2023-09-16,4\n"
+        "Bob,Math,T1,2023-09-16,3\n",
+    ], ids=["truncated", "rewritten"])
+    def test_rewritten_file_is_fully_reparsed(self, tmp_path, rewrite):
+        """Тест полного разбора усеченного или перезаписанного файла"""
+        path = tmp_path / "log.csv"
+        path.write_text(self.HEADER + "John Doe,Math,T1,2023-09-16,5\n")
+        state = tmp_path / "state.pkl"
+        self.create([str(path)], state)
+
+        path.write_text(rewrite)
+        totals = self.create([str(path)], state).totals
+
+        assert list(totals) == ["Bob"]
+
+    def test_state_respects_policy(self, tmp_path):
+        """Тест, что состояние другой политики валидации не используется"""
+        path = tmp_path / "log.csv"
+        path.write_text(self.HEADER + "John Doe,Math,T1,2023-09-16,5\nJane Smith,Math,T1,2023-09-16,x\n")
+        state = str(tmp_path / "state.pkl")
+        ReportFactory.create_report("students_performance", [str(path)],
+                                    incremental=IncrementalState(state), validator=Validator("skip"))
+
+        with pytest.raises(ValueError, match="Неверный формат данных"):
+            ReportFactory.create_report("students_performance", [str(path)],
+                                        incremental=IncrementalState(state), validator=Validator("strict"))
+
+    def test_budget_covers_whole_file(self, tmp_path):
+        """Тест, что при продолжении счетчики и лимиты учитывают ранее прочитанные строки"""
+        path = tmp_path / "log.csv"
+        path.write_text(self.HEADER + "John Doe,Math,T1,2023-09-16,5\nJane Smith,Math,T1,2023-09-16,x\n")
+        state = str(tmp_path / "state.pkl")
+        for validator in (Validator("budget", max_errors=1), Validator("skip")):
+            ReportFactory.create_report("students_performance", [str(path)],
+                                        incremental=IncrementalState(state), validator=validator)
+
+        with open(path, 'a') as f:
+            f.write("John Doe,Math,T1,2023-09-17,y\nJane Smith,Math,T1,2023-09-17,4\n")
+        with pytest.raises(ValueError, match="Превышен лимит неверных строк \\(1\\)"):
+            ReportFactory.create_report("students_performance", [str(path)],
+                                        incremental=IncrementalState(state),
+                                        validator=Validator("budget", max_errors=1))
+
+        validator = Validator("skip")
+        report = ReportFactory.create_report("students_performance", [str(path)],
+                                             incremental=IncrementalState(state), validator=validator)
+        assert report.totals == {"John Doe": [5, 1], "Jane Smith": [4, 1]}
+        assert validator.rows == 4
+        assert validator.rejected == 2
+
+
+class TestMetrics:
+    """Тесты замеров стадий отчета"""
+
+    def test_stages_and_files_recorded(self, temp_csv_files, sample_student_data):
+        """Тест записи свертки по каждому файлу и стадий вывода"""
+        seen = []
+        metrics = Metrics(hooks=[seen.append])
+        report = ReportFactory.create_report("students_performance", temp_csv_files, metrics=metrics)
+        report.write(io.StringIO(), "csv", metrics=metrics)
+
+        assert [record["stage"] for record in seen] == ["aggregate", "aggregate", "merge", "sort", "render"]
+        assert [record["file"] for record in seen[:2]] == temp_csv_files
+        assert [record["rows"] for record in seen[:2]] == [8, 7]
+        assert seen[0]["bytes"] == os.path.getsize(temp_csv_files[0])
+
+        summary = metrics.summary()
+        assert summary["stages"]["aggregate"]["rows"] == len(sample_student_data)
+        assert summary["stages"]["aggregate"]["rows_per_sec"] > 0
+        assert report.totals == ReportFactory.create_report("students_performance", temp_csv_files).totals
+
+    def test_parallel_aggregate_recorded_once(self, temp_csv_files):
+        """Тест замера свертки целиком при параллельном чтении"""
+        metrics = Metrics()
+        ReportFactory.create_report("students_performance", temp_csv_files, workers=2, metrics=metrics)
+
+        aggregate = [record for record in metrics.records if record["stage"] == "aggregate"]
+        assert len(aggregate) == 1
+        assert aggregate[0]["bytes"] == sum(os.path.getsize(file) for file in temp_csv_files)
+
+    def test_main_function_with_profile(self, temp_csv_files, tmp_path, capsys):
+        """Тест вывода замеров в stderr и сохранения профиля стадии"""
+        pstats_path = tmp_path / "aggregate.prof"
+        args = ['main.py', '--files', *temp_csv_files, '--report', 'students_performance',
+                '--profile', '--pstats', str(pstats_path)]
+
+        with patch('sys.argv', args):
+            from main import main
+            main()
+
+        captured = capsys.readouterr()
+        assert "Student Name" in captured.out
+        summary = json.loads(captured.err)
+        assert set(summary["stages"]) == {"aggregate", "merge", "sort", "render"}
+        assert pstats_path.stat().st_size > 0
+
+    def test_dump_profile_without_stage(self):
+        """Тест ошибки сохранения профиля без профилируемой стадии"""
+        with pytest.raises(ValueError):
+            Metrics().dump_profile("unused.prof")
+
+
 class TestReportFactory:
     """Тесты для фабрики отчетов"""
 
@@ -194,10 +1404,100 @@ class TestReportFactory:
         with pytest.raises(ValueError, match=f"Отчет 'nonexistent' не зарегистрирован."):
             ReportFactory.create_report("nonexistent", temp_csv_files)
 
+    def test_create_report_parallel_matches_serial(self, temp_csv_files):
+        """Тест, что параллельное чтение дает тот же результат, что и последовательное"""
+        serial = ReportFactory.create_report("students_performance", temp_csv_files)
+        parallel = ReportFactory.create_report("students_performance", temp_csv_files, workers=2)
+
+        assert parallel.calculate_performance() == serial.calculate_performance()
+
+    def test_create_report_parallel_nonexistent_file(self, temp_csv_files, non_existent_file):
+        """Тест, что ошибка чтения файла в дочернем процессе доходит до вызывающего"""
+        with pytest.raises(FileNotFoundError, match="не найден"):
+            ReportFactory.create_report("students_performance", [temp_csv_files[0], non_existent_file], workers=2)
+
     def test_report_factory_registration(self):
         """Тест, что отчет зарегистрирован на фабрике"""
-        assert "students_performance" in ReportFactory._reports
-        assert ReportFactory._reports["students_performance"] == StudentPerformanceReport
+        assert "students_performance" in ReportFactory.report_names()
+        assert ReportFactory.report_class("students_performance") == StudentPerformanceReport
+
+    def test_lazy_registration(self, monkeypatch):
+        """Тест, что модуль отчета импортируется только при обращении к отчету"""
+        monkeypatch.setitem(ReportFactory._reports, "lazy", "reports.students_performance:StudentPerformanceReport")
+        monkeypatch.setitem(ReportFactory._reports, "broken", "reports.nonexistent:Report")
+
+        assert ReportFactory.report_class("lazy") is StudentPerformanceReport
+        # Класс запоминается после первого импорта
+        assert ReportFactory._reports["lazy"] is StudentPerformanceReport
+        with pytest.raises(ModuleNotFoundError):
+            ReportFactory.report_class("broken")
+
+    def test_startup_imports(self, tmp_path):
+        """Тест бюджета запуска main.py по -X importtime
+
+        Разбор аргументов и вывод справки не должны импортировать модули
+        отчетов, tabulate, numpy, asyncio и пул процессов, а суммарное время
+        импорта пакета reports — укладываться в бюджет.
+        """
+        import subprocess
+        root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+        env = dict(os.environ, PYTHONPYCACHEPREFIX=str(tmp_path))
+        env.pop("PYTHONDONTWRITEBYTECODE", None)
+        command = [sys.executable, "-X", "importtime", os.path.join(root, "main.py"), "--help"]
+        # Первый запуск компилирует модули в кэш байт-кода
+        subprocess.run(command, env=env, capture_output=True, check=True)
+        result = subprocess.run(command, env=env, capture_output=True, check=True, text=True)
+
+        imported = {}
+        for line in result.stderr.splitlines():
+            if not line.startswith("import time:") or "|" not in line or "cumulative" in line:
+                continue
+            _, cumulative, name = line.split("|")
+            imported[name.strip()] = int(cumulative)
+        for module in ("tabulate", "numpy", "asyncio", "concurrent.futures.process", "http.server",
+                       "reports.groupby", "reports.students_performance", "reports.columnar",
+                       "reports.cache", "reports.metrics"):
+            assert module not in imported, module
+        # Бюджет с запасом: без ленивых импортов пакет загружался около 130 мс
+        assert imported["reports"] < 60_000
+
+    REPORTS = ["students_performance", "subject_performance", "teacher_performance"]
+
+    @pytest.mark.parametrize("workers", [1, 2])
+    def test_create_reports_matches_single_reports(self, temp_csv_files, workers):
+        """Тест, что общий проход дает те же отчеты, что и отдельные"""
+        reports = ReportFactory.create_reports(self.REPORTS, temp_csv_files, workers=workers)
+
+        assert [report.totals for report in reports] == [
+            ReportFactory.create_report(name, temp_csv_files).totals for name in self.REPORTS
+        ]
+
+    def test_create_reports_reads_each_file_once(self, temp_csv_files, monkeypatch):
+        """Тест, что при нескольких отчетах каждый файл читается один раз"""
+        opened = []
+        original = BaseReport.iter_records.__func__
+        monkeypatch.setattr(BaseReport, "iter_records",
+                            classmethod(lambda cls, files, *args: opened.extend(files) or original(cls, files, *args)))
+        ReportFactory.create_reports(self.REPORTS, temp_csv_files)
+
+        assert opened == temp_csv_files
+
+    def test_create_reports_cached(self, temp_csv_files, tmp_path, monkeypatch):
+        """Тест, что кэш хранит частичные результаты всего набора отчетов"""
+        cache = PartialCache(str(tmp_path / "cache"))
+        first = ReportFactory.create_reports(self.REPORTS, temp_csv_files, cache=cache)
+        monkeypatch.setattr("reports.base_report.scan_files",
+                            lambda *args, **kwargs: pytest.fail("файл разобран повторно"))
+        second = ReportFactory.create_reports(self.REPORTS, temp_csv_files, cache=cache)
+
+        assert [report.totals for report in second] == [report.totals for report in first]
+
+    def test_create_reports_unsupported_options(self, temp_csv_files):
+        """Тест, что numpy движок не поддерживается для нескольких отчетов"""
+        with pytest.raises(ValueError, match="только для одного отчета"):
+            ReportFactory.create_reports(self.REPORTS, temp_csv_files, engine="numpy")
+        with pytest.raises(ValueError, match="Отчет 'nonexistent' не зарегистрирован."):
+            ReportFactory.create_reports(["students_performance", "nonexistent"], temp_csv_files)
 
 
 class TestIntegration:
@@ -240,6 +1540,65 @@ class TestIntegration:
         assert "Student Name" in captured.out
         assert "Average Grade" in captured.out
 
+    def test_main_function_with_top(self, capsys, temp_csv_files):
+        """Тест вывода только N лучших студентов"""
+        args = ['main.py', '--files', *temp_csv_files, '--report', 'students_performance', '--top', '2']
+
+        with patch('sys.argv', args):
+            from main import main
+            main()
+
+        captured = capsys.readouterr()
+        # Заголовок и две строки данных
+        assert captured.out.count("\n| ") == 3
+
+    @pytest.mark.parametrize("option", ["--top", "--bottom", "--offset", "--limit"])
+    def test_main_function_negative_selection(self, capsys, temp_csv_files, option):
+        """Тест, что отрицательные значения выборки отклоняются при разборе аргументов"""
+        args = ['main.py', '--files', *temp_csv_files, option, '-1']
+
+        with patch('sys.argv', args), pytest.raises(SystemExit):
+            from main import main
+            main()
+
+        assert "не может быть отрицательным" in capsys.readouterr().err
+
+    @pytest.mark.parametrize("output_format", ["csv", "tsv", "jsonl"])
+    def test_main_function_with_format_and_output(self, temp_csv_files, tmp_path, output_format):
+        """Тест потоковой записи отчета в файл в машиночитаемом формате"""
+        output = tmp_path / f"report.{output_format}"
+        args = ['main.py', '--files', *temp_csv_files, '--report', 'students_performance',
+                '--format', output_format, '--output', str(output)]
+
+        with patch('sys.argv', args):
+            from main import main
+            main()
+
+        expected = ReportFactory.create_report("students_performance", temp_csv_files).calculate_performance()
+        lines = output.read_text().splitlines()
+        if output_format == "jsonl":
+            rows = [json.loads(line) for line in lines]
+            assert rows == [{"Student Name": item["student_name"], "Average Grade": item["avg_grade"]}
+                            for item in expected]
+        else:
+            delimiter = "," if output_format == "csv" else "\t"
+            rows = list(csv.reader(lines, delimiter=delimiter))
+            assert rows[0] == ["Student Name", "Average Grade"]
+            assert rows[1:] == [[item["student_name"], str(item["avg_grade"])] for item in expected]
+
+    def test_main_function_with_several_reports(self, temp_csv_files, tmp_path):
+        """Тест записи нескольких отчетов в отдельные файлы"""
+        output = tmp_path / "report.csv"
+        args = ['main.py', '--files', *temp_csv_files, '--report', 'students_performance',
+                'subject_performance', '--format', 'csv', '--output', str(output)]
+
+        with patch('sys.argv', args):
+            from main import main
+            main()
+
+        assert (tmp_path / "report.students_performance.csv").read_text().startswith("Student Name,")
+        assert (tmp_path / "report.subject_performance.csv").read_text().startswith("Subject,")
+
     def test_main_function_with_nonexistent_file(self, capsys):
         """Тест основной функции с несуществующим файлом"""
         with patch('sys.argv', ['main.py', '--files', '/nonexistent/file.csv', '--report', 'students_performance']):